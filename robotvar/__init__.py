@@ -0,0 +1,3 @@
+"""RoboTvar - Roboto and emoji font merger for Kivy."""
+
+__version__ = "0.1.0"
@@ -33,11 +33,32 @@ def parse_args():
         action="store_true",
         help="Run Kivy test application to preview the fonts",
     )
+    group.add_argument(
+        "--bench-render",
+        action="store_true",
+        help="Time headless Kivy label rendering with the merged fonts and plain Roboto",
+    )
     group.add_argument(
         "--compare-fonts",
         action="store_true",
         help="Compare character sets between two fonts",
     )
+    group.add_argument(
+        "--coverage-matrix",
+        action="store_true",
+        help="Report codepoint overlap and Unicode block coverage of every font",
+    )
+    group.add_argument(
+        "--which-font",
+        metavar="TEXT",
+        help="List the fonts that render every character and emoji sequence of TEXT",
+    )
+    group.add_argument(
+        "--fill-mirror",
+        type=Path,
+        metavar="DIR",
+        help="Copy previously downloaded fonts into a mirror directory usable with --source",
+    )
     group.add_argument(
         "--delete",
         action="store_true",
@@ -58,12 +79,175 @@ def parse_args():
         type=Path,
         help="Second font file for comparison",
     )
+    parser.add_argument(
+        "--font-dirs",
+        type=Path,
+        nargs="+",
+        metavar="DIR",
+        help="Font directories (or files) for --coverage-matrix and --which-font (default: downloaded and merged fonts)",
+    )
+    parser.add_argument(
+        "--compare-by",
+        choices=["glyphs", "codepoints"],
+        default="glyphs",
+        help="Compare glyph names or cmap codepoint ranges (default: glyphs)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["text", "json", "csv"],
+        default="text",
+        help=(
+            "Output format of --compare-by codepoints, --coverage-matrix, --which-font "
+            "and --bench-render (default: text)"
+        ),
+    )
     parser.add_argument(
         "--output-dir",
         type=Path,
         help="Custom output directory for merged fonts",
         default=Path(__file__).parent / "merged",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        metavar="N",
+        help=(
+            "Merge font variants in N worker processes (0 = one per CPU, default: 1; "
+            "--coverage-matrix defaults to one per CPU)"
+        ),
+    )
+    parser.add_argument(
+        "--source",
+        metavar="SPEC",
+        help=(
+            "Where to get fonts from: 'http' (default), a mirror directory or file:// URL, "
+            "or a .zip/.tar.gz bundle (default: $ROBOTVAR_FONT_SOURCE or http)"
+        ),
+    )
+    parser.add_argument(
+        "--max-downloads",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Maximum number of font downloads in flight at once (default: 4)",
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=8,
+        metavar="N",
+        help="Size of the HTTP connection pool used for downloads (default: 8)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "Merge, then keep fonts and converted glyphs in memory and rebuild the variants "
+            "whose source fonts change in robotvar/fonts (with --merge-twemoji: DejaVuSans + Twemoji)"
+        ),
+    )
+    parser.add_argument(
+        "--watch-poll",
+        action="store_true",
+        help="Poll for changes with --watch instead of using inotify, e.g. on network or container mounts",
+    )
+    parser.add_argument(
+        "--no-pipeline",
+        action="store_true",
+        help=(
+            "Download every font before merging, instead of merging each variant as soon as "
+            "its fonts are downloaded"
+        ),
+    )
+    parser.add_argument(
+        "--no-glyph-cache",
+        action="store_true",
+        help="Do not read or write the on-disk converted emoji glyph cache",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-download every font and rebuild every merged font even if unchanged",
+    )
+    parser.add_argument(
+        "--codepoints",
+        metavar="SPEC",
+        help="Only merge emoji for these codepoints, e.g. 'U+1F600-1F64F,1F44B'",
+    )
+    parser.add_argument(
+        "--text-file",
+        type=Path,
+        metavar="PATH",
+        help="Only merge emoji used in this UTF-8 text file (combines with --codepoints)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall time and peak traced memory of every merge phase, and peak RSS of every variant",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help=(
+            "Memory-map the source fonts and load them lazily, so parallel merges share "
+            "the emoji font's pages instead of each reading it into memory"
+        ),
+    )
+    parser.add_argument(
+        "--timings-json",
+        type=Path,
+        metavar="PATH",
+        help="Write per-phase merge timings as JSON to PATH (implies --profile)",
+    )
+    parser.add_argument(
+        "--cprofile-dir",
+        type=Path,
+        metavar="DIR",
+        help="Dump cProfile statistics of every merged variant to DIR/<variant>.prof",
+    )
+    parser.add_argument(
+        "--outline-format",
+        choices=["glyf", "cff"],
+        default="glyf",
+        help=(
+            "Outline format of the merged TossFace fonts: TrueType .ttf, or CFF .otf "
+            "that keeps the emoji charstrings unconverted (default: glyf)"
+        ),
+    )
+    parser.add_argument(
+        "--webfonts",
+        action="store_true",
+        help=(
+            "Also write WOFF (and WOFF2 when brotli is installed) next to every merged font "
+            "and print a size report"
+        ),
+    )
+    parser.add_argument(
+        "--render-text",
+        action="append",
+        metavar="TEXT",
+        help="String to render with --bench-render, may be repeated (default: built-in samples)",
+    )
+    parser.add_argument(
+        "--render-sizes",
+        type=int,
+        nargs="+",
+        metavar="PX",
+        help="Font sizes for --bench-render (default: 16 32 64)",
+    )
+    parser.add_argument(
+        "--render-variants",
+        nargs="+",
+        choices=["Regular", "Bold", "Italic", "BoldItalic"],
+        help="Font variants for --bench-render (default: all)",
+    )
+    parser.add_argument(
+        "--render-repeat",
+        type=int,
+        default=30,
+        metavar="N",
+        help="Timed renders of every string and size per font with --bench-render (default: 30)",
+    )
     parser.add_argument(
         "--showcase",
         action="store_true",
@@ -77,7 +261,12 @@ def main():
 
     # Handle delete/reset actions first
     if args.delete or args.delete_all:
-        from .scripts.reset import delete_merged_folder, delete_all_fonts, delete_screenshots_folder_content
+        from .scripts.reset import (
+            delete_all_fonts,
+            delete_cache,
+            delete_merged_folder,
+            delete_screenshots_folder_content,
+        )
         if args.delete:
             merged_dir = args.output_dir
             delete_merged_folder(merged_dir)
@@ -87,6 +276,7 @@ def main():
             delete_screenshots_folder_content(screenshots_folder)
             delete_merged_folder(args.output_dir)
             delete_all_fonts(fonts_dir)
+            delete_cache(Path(__file__).parent / "cache")
         return
 
     # --showcase only valid with --merge-twemoji
@@ -97,6 +287,41 @@ def main():
         )
         sys.exit(1)
 
+    # CFF output keeps TossFace charstrings, Twemoji outlines are TrueType
+    if args.outline_format == "cff" and args.merge_twemoji:
+        print(
+            "Error: --outline-format cff cannot be used with --merge-twemoji.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # Watch mode merges local fonts in-process; it never downloads
+    if args.watch and (args.download_only or args.test_app or args.mmap):
+        print(
+            "Error: --watch cannot be used with --download-only, --test-app or --mmap.",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+    # Merges default to one process, the coverage audit to one per CPU
+    if args.jobs is None:
+        args.jobs = 0 if args.coverage_matrix else 1
+
+    # Reject a bad emoji selection before downloading anything
+    from .scripts.subset import collect_codepoints
+
+    try:
+        codepoints = collect_codepoints(args.codepoints, args.text_file)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.fill_mirror:
+        from .scripts.sources import fill_mirror
+
+        fill_mirror(args.fill_mirror)
+        return
+
     if args.compare_fonts:
         if not args.font1 or not args.font2:
             print(
@@ -106,7 +331,61 @@ def main():
             sys.exit(1)
         from .scripts.compare_sources import compare_fonts
 
-        compare_fonts(args.font1, args.font2)
+        compare_fonts(
+            args.font1,
+            args.font2,
+            by=args.compare_by,
+            output_format=args.output_format,
+        )
+        return
+
+    if args.coverage_matrix:
+        from .scripts.coverage_matrix import audit_fonts
+
+        audit_fonts(
+            font_dirs=args.font_dirs,
+            output_format=args.output_format,
+            jobs=args.jobs,
+        )
+        return
+
+    if args.which_font is not None:
+        from .scripts.coverage_index import find_fonts_for_text
+
+        find_fonts_for_text(
+            args.which_font,
+            font_dirs=args.font_dirs,
+            output_format=args.output_format,
+        )
+        return
+
+    if args.bench_render:
+        from .scripts.bench_render import bench_render
+
+        bench_render(
+            font_dir=args.output_dir,
+            texts=args.render_text,
+            sizes=args.render_sizes,
+            variants=args.render_variants,
+            repeat=args.render_repeat,
+            output_format=args.output_format,
+        )
+        return
+
+    if args.watch:
+        from .scripts.glyph_cache import DEFAULT_CACHE_DIR
+        from .scripts.watch import watch_fonts
+
+        watch_fonts(
+            merge_twemoji=args.merge_twemoji,
+            showcase=args.showcase,
+            output_dir=args.output_dir,
+            glyph_cache_dir=None if args.no_glyph_cache else DEFAULT_CACHE_DIR,
+            codepoints=codepoints,
+            profile=args.profile,
+            outline_format=args.outline_format,
+            poll=args.watch_poll,
+        )
         return
 
     try:
@@ -115,17 +394,87 @@ def main():
 
             run_test_app(font_dir=args.output_dir)
         else:
-            if not args.merge_only and not args.merge_twemoji:
+            # Without a mode flag, merges start as soon as their fonts are downloaded
+            pipelined = not (
+                args.download_only or args.merge_only or args.merge_twemoji or args.no_pipeline
+            )
+            if not args.merge_only and not args.merge_twemoji and not pipelined:
                 from .scripts.download import download_fonts
-                download_fonts()
+                download_fonts(
+                    force=args.force,
+                    max_concurrency=args.max_downloads,
+                    max_connections=args.max_connections,
+                    source=args.source,
+                )
 
             if not args.download_only:
+                from .scripts.glyph_cache import DEFAULT_CACHE_DIR
+
+                glyph_cache_dir = None if args.no_glyph_cache else DEFAULT_CACHE_DIR
+                profile = args.profile or args.timings_json is not None
                 if args.merge_twemoji:
                     from .scripts.merge_dejavu_and_twemoji import merge_all_fonts as merge_twemoji_fonts
-                    merge_twemoji_fonts(showcase=args.showcase, output_dir=args.output_dir)
+                    timings = merge_twemoji_fonts(
+                        showcase=args.showcase,
+                        output_dir=args.output_dir,
+                        jobs=args.jobs,
+                        glyph_cache_dir=glyph_cache_dir,
+                        force=args.force,
+                        codepoints=codepoints,
+                        profile=profile,
+                        cprofile_dir=args.cprofile_dir,
+                        use_mmap=args.mmap,
+                    )
+                elif pipelined:
+                    from .scripts.pipeline import download_and_merge_fonts
+                    timings = download_and_merge_fonts(
+                        output_dir=args.output_dir,
+                        jobs=args.jobs,
+                        glyph_cache_dir=glyph_cache_dir,
+                        force=args.force,
+                        codepoints=codepoints,
+                        profile=profile,
+                        cprofile_dir=args.cprofile_dir,
+                        outline_format=args.outline_format,
+                        use_mmap=args.mmap,
+                        source=args.source,
+                        max_concurrency=args.max_downloads,
+                        max_connections=args.max_connections,
+                    )
                 else:
                     from .scripts.merge import merge_all_fonts as merge_tossface_fonts
-                    merge_tossface_fonts(output_dir=args.output_dir)
+                    timings = merge_tossface_fonts(
+                        output_dir=args.output_dir,
+                        jobs=args.jobs,
+                        glyph_cache_dir=glyph_cache_dir,
+                        force=args.force,
+                        codepoints=codepoints,
+                        profile=profile,
+                        cprofile_dir=args.cprofile_dir,
+                        outline_format=args.outline_format,
+                        use_mmap=args.mmap,
+                    )
+
+                if args.webfonts:
+                    from .scripts.webfonts import find_merged_fonts, print_size_report, write_web_fonts
+
+                    web_fonts = write_web_fonts(
+                        find_merged_fonts(args.output_dir),
+                        jobs=args.jobs,
+                        force=args.force,
+                    )
+                    print_size_report(web_fonts)
+
+                if profile:
+                    from .scripts.timings import print_timings, write_timings_json
+
+                    print_timings(timings)
+                    if args.timings_json:
+                        write_timings_json(
+                            args.timings_json,
+                            timings,
+                            mode="twemoji" if args.merge_twemoji else "tossface",
+                        )
 
     except Exception as e:
         print("Error occurred:")
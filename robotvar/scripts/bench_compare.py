@@ -0,0 +1,96 @@
+"""Benchmark for the font comparison readers in compare_sources.
+
+Times reading glyph names and codepoints with a full TTFont (the previous
+behavior) against the table-selective fast path, and reports the peak
+traced memory of each.
+
+Usage:
+    python -m robotvar.scripts.bench_compare [FONT ...] [--repeat N]
+"""
+
+import argparse
+import time
+import tracemalloc
+from fontTools.ttLib import TTFont
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from .compare_sources import read_codepoint_ranges, read_glyph_names
+
+FONT_SUFFIXES = (".ttf", ".otf")
+
+
+def _legacy_read(font_path: Path) -> None:
+    font = TTFont(font_path)
+    font.getGlyphOrder()
+    font.getBestCmap()
+
+
+def _fast_read(font_path: Path) -> None:
+    read_glyph_names(font_path)
+    read_codepoint_ranges(font_path)
+
+
+def measure(func: Callable[[Path], None], fonts: List[Path], repeat: int) -> Tuple[float, int]:
+    """Return (best wall time in seconds, peak traced bytes) of func over all fonts."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for font_path in fonts:
+            func(font_path)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        for font_path in fonts:
+            func(font_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def default_fonts() -> List[Path]:
+    """Return every font under robotvar/fonts and robotvar/merged."""
+    package_dir = Path(__file__).parent.parent
+    fonts = []
+    for directory in (package_dir / "fonts", package_dir / "merged"):
+        fonts.extend(p for p in directory.rglob("*") if p.suffix.lower() in FONT_SUFFIXES)
+    return sorted(fonts)
+
+
+def run_benchmark(fonts: List[Path], repeat: int = 3) -> None:
+    """Print time and peak memory of the legacy and fast readers.
+
+    Args:
+        fonts: Font files to read
+        repeat: Number of timed runs, the best is reported
+    """
+    if not fonts:
+        print("No fonts to benchmark. Please run download first or pass font paths.")
+        return
+    print(f"Reading glyph names and codepoints of {len(fonts)} fonts (best of {repeat})")
+    legacy_time, legacy_peak = measure(_legacy_read, fonts, repeat)
+    fast_time, fast_peak = measure(_fast_read, fonts, repeat)
+    print(f"{'reader':<10} {'time':>10} {'peak memory':>14}")
+    print(f"{'TTFont':<10} {legacy_time * 1000:>8.1f} ms {legacy_peak / 1024:>11.0f} KiB")
+    print(f"{'fast path':<10} {fast_time * 1000:>8.1f} ms {fast_peak / 1024:>11.0f} KiB")
+    if fast_time > 0 and fast_peak > 0:
+        print(
+            f"Speedup: {legacy_time / fast_time:.1f}x, "
+            f"peak memory: {legacy_peak / fast_peak:.1f}x lower"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark full TTFont parsing against the compare_sources fast path."
+    )
+    parser.add_argument("fonts", type=Path, nargs="*", help="Fonts to read (default: all fonts)")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs")
+    args = parser.parse_args()
+    run_benchmark(args.fonts or default_fonts(), repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""Offline benchmark for the merge pipeline.
+
+Generates synthetic base and emoji fonts with fontTools' FontBuilder (no
+network needed) and times each merge engine stage of merge.py (CFF emoji into a
+glyf base, unscaled, with both TrueType and CFF output) and
+merge_dejavu_and_twemoji.py (glyf emoji with composites into a glyf base,
+scaled). The size of every merged font is recorded too. Results are written
+as JSON so runs on different commits can be compared.
+
+Usage:
+    python -m robotvar.scripts.bench_merge [--glyphs N] [--repeat N] [--compare OLD.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from fontTools import version as fonttools_version
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_l_y_f import Glyph, GlyphComponent
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from . import merge, merge_dejavu_and_twemoji
+from .engine import MergeEngine
+from .glyph_cache import GlyphCache
+
+RESULTS_VERSION = 1
+DEFAULT_RESULTS_DIR = Path(__file__).parent.parent.parent / "bench-results"
+
+BASE_FIRST_CODEPOINT = 0x20
+EMOJI_FIRST_CODEPOINT = 0x1F000
+
+
+def _draw_shape(pen, index: int, upm: int, cubic: bool) -> None:
+    """Draw a ring of curved petals; the point count varies with index."""
+    center = upm / 2
+    petals = 4 + index % 5
+    outer, inner = upm * 0.45, upm * 0.2
+    pen.moveTo((center + outer, center))
+    for i in range(1, petals + 1):
+        angle = 2 * math.pi * i / petals
+        mid = angle - math.pi / petals
+        end = (round(center + outer * math.cos(angle)), round(center + outer * math.sin(angle)))
+        control = (round(center + inner * math.cos(mid)), round(center + inner * math.sin(mid)))
+        if cubic:
+            pen.curveTo(control, control, end)
+        else:
+            pen.qCurveTo(control, end)
+    pen.closePath()
+    pen.moveTo((round(center - inner / 2), round(center - inner / 2)))
+    pen.lineTo((round(center - inner / 2), round(center + inner / 2)))
+    pen.lineTo((round(center + inner / 2), round(center + inner / 2)))
+    pen.lineTo((round(center + inner / 2), round(center - inner / 2)))
+    pen.closePath()
+
+
+def build_synthetic_font(
+    output_path: Path,
+    glyph_count: int,
+    flavor: str = "glyf",
+    upm: int = 2048,
+    first_codepoint: int = BASE_FIRST_CODEPOINT,
+    prefix: str = "g",
+    composite_every: int = 0,
+) -> Path:
+    """Write a synthetic font with glyph_count mapped glyphs.
+
+    Args:
+        output_path: Where to save the font
+        glyph_count: Number of glyphs besides .notdef, each mapped to a codepoint
+        flavor: "glyf" for quadratic TrueType outlines or "cff" for CFF charstrings
+        upm: unitsPerEm of the font
+        first_codepoint: Codepoint of the first glyph, the rest follow consecutively
+        prefix: Glyph name prefix, so base and emoji glyph names do not clash
+        composite_every: Make every Nth glyph a composite of two others (glyf only, 0 = none)
+
+    Returns:
+        output_path
+    """
+    names = [f"{prefix}{i:05d}" for i in range(glyph_count)]
+    glyph_order = [".notdef"] + names
+    fb = FontBuilder(upm, isTTF=flavor == "glyf")
+    fb.setupGlyphOrder(glyph_order)
+    fb.setupCharacterMap({first_codepoint + i: name for i, name in enumerate(names)})
+
+    if flavor == "cff":
+        charstrings = {}
+        for i, name in enumerate(glyph_order):
+            pen = T2CharStringPen(upm, None)
+            _draw_shape(pen, i, upm, cubic=True)
+            charstrings[name] = pen.getCharString()
+        fb.setupCFF(f"{prefix}Bench", {"FullName": f"{prefix} Bench"}, charstrings, {})
+    else:
+        glyphs = {}
+        for i, name in enumerate(glyph_order):
+            if composite_every and i > 2 and i % composite_every == 0:
+                continue
+            pen = TTGlyphPen(None)
+            _draw_shape(pen, i, upm, cubic=False)
+            glyphs[name] = pen.glyph()
+        fb.setupGlyf(glyphs)
+        glyf = fb.font["glyf"]
+        for i, name in enumerate(glyph_order):
+            if name in glyphs:
+                continue
+            glyph = Glyph()
+            glyph.numberOfContours = -1
+            glyph.components = []
+            for offset, source in ((0, glyph_order[i - 1]), (upm // 4, glyph_order[i - 2])):
+                component = GlyphComponent()
+                component.glyphName = source
+                component.x, component.y = offset, offset
+                component.flags = 0
+                glyph.components.append(component)
+            glyf[name] = glyph
+            glyph.recalcBounds(glyf)
+
+    if flavor == "cff":
+        fb.setupHorizontalMetrics({name: (upm, charstrings[name].calcBounds(None)[0]) for name in glyph_order})
+    else:
+        glyf = fb.font["glyf"]
+        fb.setupHorizontalMetrics({name: (upm, getattr(glyf[name], "xMin", 0)) for name in glyph_order})
+    fb.setupHorizontalHeader(ascent=upm, descent=0)
+    fb.setupNameTable({"familyName": f"{prefix} Bench", "styleName": "Regular"})
+    fb.setupOS2()
+    fb.setupPost()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    fb.save(output_path)
+    return output_path
+
+
+def _load_full(font_path: Path) -> TTFont:
+    font = TTFont(font_path)
+    font.ensureDecompiled()
+    return font
+
+
+def measure(func: Callable[[Any], Any], setup: Callable[[], Any] = lambda: None, repeat: int = 3) -> float:
+    """Return the best wall time in seconds of func(setup()) over repeat runs.
+
+    setup() runs before every timed call and is not timed, so each run starts
+    from fresh state.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(state)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_engine(
+    engine: MergeEngine, base_path: Path, emoji_path: Path, output_path: Path, repeat: int
+) -> Dict[str, float]:
+    """Time every stage of one merge engine.
+
+    Each run merges with an empty in-memory glyph cache, so every glyph is
+    converted. Reports the best time of every stage, of merge_fonts end to
+    end and of recompiling the merged font ("recompile", with every table
+    decompiled first).
+    """
+    results: Dict[str, float] = {}
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            timings = engine.merge(
+                base_path, emoji_path, output_path, cache=GlyphCache(None), profile=True, trace_memory=False
+            )
+            total = time.perf_counter() - start
+        for phase in timings["phases"]:
+            results[phase["name"]] = min(results.get(phase["name"], float("inf")), phase["seconds"])
+        results["merge_fonts"] = min(results.get("merge_fonts", float("inf")), total)
+    results["recompile"] = measure(
+        lambda font: font.save(io.BytesIO()), lambda: _load_full(output_path), repeat=repeat
+    )
+    return results
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmark(
+    glyphs: int = 1000,
+    base_glyphs: int = 500,
+    emoji_upm: int = 1000,
+    repeat: int = 3,
+) -> Dict[str, Any]:
+    """Build synthetic fonts and time the merge phases of both merge modules.
+
+    Args:
+        glyphs: Number of emoji glyphs in the synthetic emoji fonts
+        base_glyphs: Number of glyphs in the synthetic base font
+        emoji_upm: unitsPerEm of the glyf emoji font (the base font uses 2048)
+        repeat: Number of timed runs per phase, the best is reported
+
+    Returns:
+        Benchmark record with the parameters and per-phase seconds of every case
+    """
+    with tempfile.TemporaryDirectory(prefix="robotvar-bench-") as tmp:
+        workdir = Path(tmp)
+        print(f"Building synthetic fonts ({base_glyphs} base glyphs, {glyphs} emoji glyphs)...")
+        base = build_synthetic_font(workdir / "base.ttf", base_glyphs, "glyf", upm=2048, prefix="b")
+        # TossFace-like: CFF emoji with the base font's UPM, so merge.py does not scale
+        emoji_cff = build_synthetic_font(
+            workdir / "emoji.otf", glyphs, "cff", upm=2048, first_codepoint=EMOJI_FIRST_CODEPOINT, prefix="e"
+        )
+        # Twemoji-like: layered glyf emoji with composites and a different UPM
+        emoji_glyf = build_synthetic_font(
+            workdir / "emoji.ttf",
+            glyphs,
+            "glyf",
+            upm=emoji_upm,
+            first_codepoint=EMOJI_FIRST_CODEPOINT,
+            prefix="e",
+            composite_every=10,
+        )
+
+        cases = [
+            ("merge", merge.create_engine(), emoji_cff, "merge.ttf"),
+            ("merge_cff", merge.create_engine(outline_format="cff"), emoji_cff, "merge.otf"),
+            ("merge_dejavu_and_twemoji", merge_dejavu_and_twemoji.create_engine(), emoji_glyf, "twemoji.ttf"),
+        ]
+        results = {}
+        sizes = {}
+        for case, engine, emoji, output_name in cases:
+            print(f"Timing {case}...")
+            output_path = workdir / output_name
+            results[case] = bench_engine(engine, base, emoji, output_path, repeat)
+            sizes[case] = output_path.stat().st_size
+
+    return {
+        "version": RESULTS_VERSION,
+        "commit": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "fonttools": fonttools_version,
+        "params": {"glyphs": glyphs, "base_glyphs": base_glyphs, "emoji_upm": emoji_upm, "repeat": repeat},
+        "results": results,
+        "sizes": sizes,
+    }
+
+
+def print_results(record: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    """Print per-phase times, with the change against a baseline record if given."""
+    if baseline and baseline.get("params") != record["params"]:
+        print("⚠️  Baseline was run with different parameters, deltas are not comparable")
+    for case, phases in record["results"].items():
+        print(f"\n{case}")
+        old_phases = (baseline or {}).get("results", {}).get(case, {})
+        for phase, seconds in phases.items():
+            line = f"  {phase:<12} {seconds * 1000:>10.1f} ms"
+            old = old_phases.get(phase)
+            if old:
+                line += f"  (was {old * 1000:.1f} ms, {(seconds - old) / old * 100:+.1f}%)"
+            print(line)
+        size = record.get("sizes", {}).get(case)
+        if size is not None:
+            line = f"  {'size':<12} {size / 1024:>10.1f} KiB"
+            old = (baseline or {}).get("sizes", {}).get(case)
+            if old:
+                line += f"  (was {old / 1024:.1f} KiB, {(size - old) / old * 100:+.1f}%)"
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the merge pipeline phases on synthetic fonts."
+    )
+    parser.add_argument("--glyphs", type=int, default=1000, help="Emoji glyphs in the synthetic emoji fonts")
+    parser.add_argument("--base-glyphs", type=int, default=500, help="Glyphs in the synthetic base font")
+    parser.add_argument("--emoji-upm", type=int, default=1000, help="unitsPerEm of the glyf emoji font")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs per phase")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help=f"Results file (default: {DEFAULT_RESULTS_DIR.name}/merge-<commit>.json)",
+    )
+    parser.add_argument("--compare", type=Path, metavar="OLD.json", help="Show changes against earlier results")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot read {args.compare}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    record = run_benchmark(
+        glyphs=args.glyphs,
+        base_glyphs=args.base_glyphs,
+        emoji_upm=args.emoji_upm,
+        repeat=args.repeat,
+    )
+    print_results(record, baseline)
+
+    output = args.output or DEFAULT_RESULTS_DIR / f"merge-{record['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(record, indent=2) + "\n", encoding="utf-8")
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Headless text rendering benchmark for RoboTvar fonts.
+
+Times how quickly Kivy lays out and rasterizes labels with the merged
+fonts compared with plain Roboto, without opening a window: Kivy's
+CoreLabel runs on a dummy SDL video driver and no Window is created.
+Each sample does what CoreLabel.refresh() does before uploading to a GL
+texture (resolve the font, lay out the text, render it to image data), so
+the numbers are the font-dependent part of texture creation.
+"""
+
+import csv
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+
+VARIANTS = ("Regular", "Bold", "Italic", "BoldItalic")
+
+DEFAULT_TEXTS = (
+    "The quick brown fox jumps over the lazy dog 0123456789",
+    "✔ Hello World! 👋 🌍",
+    "Crown 👑, rocket 🚀 and butterfly 🦋",
+    "👍🏽 👨‍👩‍👧‍👦 🏳️‍🌈 🇰🇷",
+)
+DEFAULT_SIZES = (16, 32, 64)
+DEFAULT_REPEAT = 30
+
+
+def _core_label():
+    """Import Kivy's CoreLabel on a dummy SDL backend, without a window."""
+    os.environ["KIVY_NO_ARGS"] = "1"
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ.setdefault("KIVY_NO_FILELOG", "1")
+    os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+    from kivy.core.text import Label as CoreLabel
+
+    return CoreLabel
+
+
+def find_render_fonts(font_dir: Path, variants: Sequence[str] = VARIANTS) -> Dict[str, Dict[str, Path]]:
+    """Return the font files to benchmark by family and variant.
+
+    Plain Roboto is the baseline; RoboTvar and DejaVuTwemoji are taken from
+    font_dir. Missing files are skipped.
+
+    Args:
+        font_dir: Directory containing merged fonts
+        variants: Variants to include, e.g. "Regular" or "BoldItalic"
+    """
+    roboto_dir = Path(__file__).parent.parent / "fonts" / "roboto"
+    candidates = {
+        "Roboto": lambda variant: roboto_dir / f"Roboto-{variant}.ttf",
+        "RoboTvar": lambda variant: font_dir / f"RoboTvar-{variant}.ttf",
+        "DejaVuTwemoji": lambda variant: font_dir / f"DejaVuTwemoji-{variant}.ttf",
+    }
+    families = {}
+    for family, path_for in candidates.items():
+        paths = {variant: path_for(variant) for variant in variants}
+        paths = {variant: path for variant, path in paths.items() if path.exists()}
+        if paths:
+            families[family] = paths
+    return families
+
+
+def percentile(sorted_values: Sequence[float], percent: float) -> float:
+    """Return the nearest-rank percentile of already sorted values."""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def time_label(core_label, font_name: str, text: str, font_size: int) -> float:
+    """Return the seconds taken to lay out and rasterize one label."""
+    label = core_label(text=text, font_name=font_name, font_size=font_size)
+    start = time.perf_counter()
+    label.resolve_font_name()
+    label.render()
+    label.render(real=True)
+    return time.perf_counter() - start
+
+
+def run_render_benchmark(
+    font_dir: Path,
+    texts: Sequence[str] = DEFAULT_TEXTS,
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    variants: Sequence[str] = VARIANTS,
+    repeat: int = DEFAULT_REPEAT,
+) -> Dict[str, Any]:
+    """Time label rendering with every font variant.
+
+    Every font file is registered with Kivy as its own font name, so bold
+    and italic come from the font files rather than synthesized styles.
+    The first render of each font and size loads the font into the text
+    provider's cache; it is reported separately as "cold_ms" and excluded
+    from the percentiles.
+
+    Args:
+        font_dir: Directory containing merged fonts
+        texts: Strings to render
+        sizes: Font sizes in pixels
+        variants: Font variants to benchmark
+        repeat: Timed renders of every text and size per font
+
+    Returns:
+        Report with the parameters and per-font latency statistics in milliseconds
+    """
+    families = find_render_fonts(font_dir, variants)
+    if not families:
+        raise FileNotFoundError(f"No fonts to benchmark in {font_dir}. Please run font merging first.")
+
+    core_label = _core_label()
+    from kivy.core.text import LabelBase
+
+    fonts = []
+    for family, paths in families.items():
+        for variant, font_path in paths.items():
+            font_name = f"{family}-{variant}"
+            LabelBase.register(name=font_name, fn_regular=str(font_path))
+            print(f"⏱️  Rendering with {font_name}...", file=sys.stderr)
+            cold = []
+            samples = []
+            for font_size in sizes:
+                for i, text in enumerate(texts):
+                    seconds = time_label(core_label, font_name, text, font_size)
+                    if i == 0:
+                        cold.append(seconds)
+                    for _ in range(repeat):
+                        samples.append(time_label(core_label, font_name, text, font_size))
+            samples.sort()
+            fonts.append(
+                {
+                    "font": font_name,
+                    "family": family,
+                    "variant": variant,
+                    "path": str(font_path),
+                    "samples": len(samples),
+                    "cold_ms": statistics.mean(cold) * 1000,
+                    "mean_ms": statistics.mean(samples) * 1000,
+                    "p50_ms": percentile(samples, 50) * 1000,
+                    "p90_ms": percentile(samples, 90) * 1000,
+                    "p99_ms": percentile(samples, 99) * 1000,
+                    "max_ms": samples[-1] * 1000,
+                }
+            )
+
+    return {
+        "text_provider": core_label.__name__,
+        "params": {"texts": list(texts), "sizes": list(sizes), "repeat": repeat},
+        "fonts": fonts,
+    }
+
+
+def write_render_report(report: Dict[str, Any], output_format: str, out: TextIO) -> None:
+    """Write a run_render_benchmark() report as text, JSON or CSV."""
+    columns = ["samples", "cold_ms", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms"]
+    if output_format == "json":
+        json.dump(report, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["font"] + columns)
+        for font in report["fonts"]:
+            writer.writerow([font["font"]] + [font[column] for column in columns])
+        return
+
+    params = report["params"]
+    out.write(
+        f"\n{report['text_provider']}: {len(params['texts'])} strings × sizes "
+        f"{', '.join(map(str, params['sizes']))} × {params['repeat']} runs\n"
+    )
+    out.write(f"{'font':<26} {'cold':>8} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)\n")
+    baselines = {font["variant"]: font for font in report["fonts"] if font["family"] == "Roboto"}
+    for font in report["fonts"]:
+        line = f"{font['font']:<26}" + "".join(
+            f" {font[column]:>8.3f}" for column in columns[1:]
+        )
+        baseline = baselines.get(font["variant"])
+        if baseline and baseline is not font:
+            line += f"  p50 {(font['p50_ms'] - baseline['p50_ms']) / baseline['p50_ms'] * 100:+.0f}% vs Roboto"
+        out.write(line + "\n")
+
+
+def bench_render(
+    font_dir: Optional[Path] = None,
+    texts: Optional[Sequence[str]] = None,
+    sizes: Optional[Sequence[int]] = None,
+    variants: Optional[Sequence[str]] = None,
+    repeat: int = DEFAULT_REPEAT,
+    output_format: str = "text",
+    out: Optional[TextIO] = None,
+) -> Dict[str, Any]:
+    """Run the headless rendering benchmark and write its report.
+
+    Args:
+        font_dir: Directory containing merged fonts, defaults to robotvar/merged
+        texts: Strings to render, defaults to DEFAULT_TEXTS
+        sizes: Font sizes in pixels, defaults to DEFAULT_SIZES
+        variants: Font variants to benchmark, defaults to all
+        repeat: Timed renders of every text and size per font
+        output_format: "text", "json" or "csv"
+        out: Stream to write to, defaults to stdout
+
+    Returns:
+        Report returned by run_render_benchmark()
+    """
+    report = run_render_benchmark(
+        font_dir or (Path(__file__).parent.parent / "merged"),
+        texts=texts or DEFAULT_TEXTS,
+        sizes=sizes or DEFAULT_SIZES,
+        variants=variants or VARIANTS,
+        repeat=repeat,
+    )
+    write_render_report(report, output_format, out or sys.stdout)
+    return report
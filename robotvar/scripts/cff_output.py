@@ -0,0 +1,157 @@
+"""CFF-flavored (.otf) output for RoboTvar merges.
+
+Instead of drawing every TossFace charstring into a TrueType glyph, the
+merged font keeps CFF outlines: emoji charstrings are copied as compiled
+bytecode together with the emoji font's subroutines and Private dict, and
+the base font's quadratic glyf outlines are converted to cubic charstrings
+(exact up to rounding control points to integers). Base charstrings are
+kept per process, keyed by the base font digest, so a base font is
+converted only once.
+"""
+
+from fontTools.cffLib import (
+    CFFFontSet,
+    CharStrings,
+    GlobalSubrsIndex,
+    PrivateDict,
+    TopDict,
+    TopDictIndex,
+)
+from fontTools.misc.psCharStrings import T2CharString
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.ttLib import newTable
+from typing import Dict, List, Set, Tuple
+
+from .digest import file_digest
+from .engine import MergeContext
+
+OUTLINE_FORMATS = ("glyf", "cff")
+
+# Tables only meaningful for TrueType outlines
+TRUETYPE_TABLES = ("glyf", "loca", "fpgm", "prep", "cvt ", "hdmx", "LTSH", "VDMX")
+
+# Top dict strings and the name table IDs they are taken from
+TOP_DICT_NAMES = {"FullName": 4, "FamilyName": 1, "Weight": 2}
+
+# Charstring programs of converted base fonts by (digest, defaultWidthX, nominalWidthX)
+_base_programs: Dict[Tuple[str, float, float], Dict[str, List]] = {}
+
+
+def _width_operand(advance: int, private: PrivateDict):
+    """Return the charstring width for advance, None when it is the default."""
+    if advance == private.defaultWidthX:
+        return None
+    return advance - private.nominalWidthX
+
+
+def base_charstring_programs(ctx: MergeContext, private: PrivateDict) -> Dict[str, List]:
+    """Return charstring programs of every base font glyph, converting them once.
+
+    Args:
+        ctx: Merge context with the base font loaded
+        private: Private dict the programs' widths are encoded against
+    """
+    key = (file_digest(ctx.base_font_path), private.defaultWidthX, private.nominalWidthX)
+    programs = _base_programs.get(key)
+    if programs is not None:
+        print(f"♻️  Reused {len(programs)} converted base glyphs")
+        return programs
+
+    glyph_set = ctx.base_font.getGlyphSet()
+    metrics = ctx.base_font["hmtx"].metrics
+    programs = {}
+    for glyph_name in ctx.glyph_order:
+        if glyph_name in ctx.new_glyphs:
+            continue
+        pen = T2CharStringPen(_width_operand(metrics[glyph_name][0], private), glyph_set)
+        glyph_set[glyph_name].draw(pen)
+        programs[glyph_name] = pen.getCharString().program
+    _base_programs[key] = programs
+    print(f"Converted {len(programs)} base glyphs to CFF")
+    return programs
+
+
+def retain_base_programs(digests: Set[str]) -> None:
+    """Drop converted base charstrings of every base font digest not in digests."""
+    for key in [key for key in _base_programs if key[0] not in digests]:
+        del _base_programs[key]
+
+
+def build_cff_outlines(ctx: MergeContext) -> None:
+    """Replace the base font's glyf outlines with a CFF table of all glyphs.
+
+    Emoji charstrings are copied without decompiling them; the output takes
+    the emoji font's subroutines and Private dict (hinting, width defaults)
+    so they stay valid. CID-keyed emoji fonts are redrawn instead.
+    """
+    print("Building CFF outlines...")
+    emoji_cff = ctx.emoji_font["CFF "].cff
+    emoji_top = emoji_cff[emoji_cff.fontNames[0]]
+    cid_keyed = hasattr(emoji_top, "FDArray")
+
+    private = PrivateDict()
+    if cid_keyed:
+        global_subrs = GlobalSubrsIndex()
+    else:
+        for key in emoji_top.Private.rawDict:
+            setattr(private, key, getattr(emoji_top.Private, key))
+        global_subrs = emoji_cff.GlobalSubrs
+    private.defaultWidthX = getattr(private, "defaultWidthX", 0)
+    private.nominalWidthX = getattr(private, "nominalWidthX", 0)
+
+    charstrings_by_name = {
+        glyph_name: T2CharString(program=program, private=private, globalSubrs=global_subrs)
+        for glyph_name, program in base_charstring_programs(ctx, private).items()
+    }
+    emoji_charstrings = emoji_top.CharStrings
+    emoji_metrics = ctx.emoji_font["hmtx"].metrics
+    for glyph_name in ctx.new_glyphs:
+        if glyph_name not in emoji_charstrings:
+            continue
+        source = emoji_charstrings[glyph_name]
+        if cid_keyed:
+            pen = T2CharStringPen(_width_operand(emoji_metrics[glyph_name][0], private), None)
+            source.draw(pen)
+            charstring = pen.getCharString(private, global_subrs)
+        elif source.needsDecompilation():
+            charstring = T2CharString(bytecode=source.bytecode, private=private, globalSubrs=global_subrs)
+        else:
+            charstring = T2CharString(program=list(source.program), private=private, globalSubrs=global_subrs)
+        charstrings_by_name[glyph_name] = charstring
+        ctx.converted.append(glyph_name)
+
+    base_font = ctx.base_font
+    ps_name = base_font["name"].getDebugName(6) or ctx.output_path.stem
+    top = TopDict()
+    top.charset = ctx.glyph_order
+    top.Private = private
+    top.GlobalSubrs = global_subrs
+    scale = 1 / base_font["head"].unitsPerEm
+    top.FontMatrix = [scale, 0, 0, scale, 0, 0]
+    for key, name_id in TOP_DICT_NAMES.items():
+        value = base_font["name"].getDebugName(name_id)
+        if value:
+            setattr(top, key, value)
+    charstrings = CharStrings(None, top.charset, global_subrs, private, None, None)
+    for glyph_name in ctx.glyph_order:
+        charstrings[glyph_name] = charstrings_by_name.get(glyph_name) or T2CharString(
+            program=["endchar"], private=private, globalSubrs=global_subrs
+        )
+    top.CharStrings = charstrings
+
+    font_set = CFFFontSet()
+    font_set.major, font_set.minor = 1, 0
+    font_set.otFont = base_font
+    font_set.fontNames = [ps_name]
+    font_set.topDictIndex = TopDictIndex()
+    font_set.topDictIndex.append(top)
+    font_set.GlobalSubrs = global_subrs
+    base_font["CFF "] = newTable("CFF ")
+    base_font["CFF "].cff = font_set
+
+    for table_tag in TRUETYPE_TABLES:
+        if table_tag in base_font:
+            del base_font[table_tag]
+    base_font.sfntVersion = "OTTO"
+    base_font["maxp"].tableVersion = 0x00005000
+    print(f"✅ Copied {len(ctx.converted)} emoji charstrings")
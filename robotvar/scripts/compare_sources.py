@@ -5,20 +5,245 @@ Provides functionality to compare character sets between fonts.
 
 import sys
 import argparse
+import csv
+import json
+import struct
+from array import array
 from fontTools.ttLib import TTFont
+from fontTools.ttLib.sfnt import SFNTReader
+from fontTools.ttLib.standardGlyphOrder import standardGlyphOrder
 from pathlib import Path
-from typing import Set
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
 
+# Inclusive (first, last) codepoint runs, sorted and non-overlapping
+CodepointRanges = List[Tuple[int, int]]
 
-def get_font_characters(font_path: Path) -> Set[str]:
+# cmap subtables in order of preference, as in TTFont.getBestCmap()
+_CMAP_PREFERENCES = ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0))
+
+
+def _uint16_array(data: bytes) -> array:
+    values = array("H", data)
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+def _post_glyph_names(post: bytes, num_glyphs: int) -> Optional[List[str]]:
+    """Decode glyph names from raw post table data, None if it has no usable names."""
+    (format_type,) = struct.unpack(">l", post[:4])
+    if format_type == 0x00010000:
+        names = list(standardGlyphOrder[:num_glyphs])
+    elif format_type == 0x00020000:
+        (count,) = struct.unpack(">H", post[32:34])
+        indices = _uint16_array(post[34 : 34 + 2 * count])
+        extra_names = []
+        pos = 34 + 2 * count
+        while pos < len(post):
+            length = post[pos]
+            extra_names.append(post[pos + 1 : pos + 1 + length].decode("latin-1"))
+            pos += 1 + length
+        names = []
+        for index in indices[:num_glyphs]:
+            if index < 258:
+                names.append(standardGlyphOrder[index])
+            elif index - 258 < len(extra_names):
+                names.append(extra_names[index - 258])
+            else:
+                return None
+    else:
+        return None
+    if len(names) < num_glyphs:
+        return None
+
+    # Make names unique the same way fontTools does
+    unique = []
+    seen = {}
+    for i, name in enumerate(names):
+        if name == "":
+            name = "glyph%.5d" % i
+        if name in seen:
+            n = seen[name]
+            while f"{name}#{n}" in seen:
+                n += 1
+            seen[name] = n + 1
+            name = f"{name}#{n}"
+        unique.append(name)
+        seen[name] = 1
+    return unique
+
+
+def read_glyph_names(font_path: Path) -> List[str]:
+    """Read the glyph order of a font without decompiling outline tables.
+
+    TrueType fonts are served straight from the raw maxp and post tables;
+    CFF fonts only load the CFF charset. Anything else falls back to a lazy
+    TTFont.
+
+    Args:
+        font_path: Path to the font file
+
+    Returns:
+        Glyph names in glyph order
+    """
+    with open(font_path, "rb") as f:
+        reader = SFNTReader(f, fontNumber=0)
+        if "CFF " not in reader and "post" in reader and "maxp" in reader:
+            (num_glyphs,) = struct.unpack(">H", reader["maxp"][4:6])
+            names = _post_glyph_names(reader["post"], num_glyphs)
+            if names is not None:
+                return names
+    font = TTFont(font_path, lazy=True, fontNumber=0)
+    try:
+        return font.getGlyphOrder()
+    finally:
+        font.close()
+
+
+def _merge_ranges(ranges: CodepointRanges) -> CodepointRanges:
+    """Sort ranges and merge overlapping or adjacent runs."""
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+
+def _format12_ranges(data: bytes) -> CodepointRanges:
+    (num_groups,) = struct.unpack(">L", data[12:16])
+    groups = array("L" if array("L").itemsize == 4 else "I", data[16 : 16 + 12 * num_groups])
+    if sys.byteorder == "little":
+        groups.byteswap()
+    ranges = []
+    for i in range(0, 3 * num_groups, 3):
+        first, last, start_glyph = groups[i], groups[i + 1], groups[i + 2]
+        if start_glyph == 0:
+            first += 1  # first codepoint maps to .notdef
+        if first <= last:
+            ranges.append((first, last))
+    return ranges
+
+
+def _format4_ranges(data: bytes) -> CodepointRanges:
+    (seg_count_x2,) = struct.unpack(">H", data[6:8])
+    seg_count = seg_count_x2 // 2
+    end_codes = _uint16_array(data[14 : 14 + seg_count_x2])
+    pos = 16 + seg_count_x2
+    start_codes = _uint16_array(data[pos : pos + seg_count_x2])
+    pos += seg_count_x2
+    id_deltas = _uint16_array(data[pos : pos + seg_count_x2])
+    pos += seg_count_x2
+    range_offsets_pos = pos
+    id_range_offsets = _uint16_array(data[pos : pos + seg_count_x2])
+
+    ranges = []
+    for seg in range(seg_count):
+        start, end = start_codes[seg], end_codes[seg]
+        if start == 0xFFFF or start > end:
+            continue
+        delta, range_offset = id_deltas[seg], id_range_offsets[seg]
+        if range_offset == 0:
+            notdef_code = (-delta) & 0xFFFF  # the one code whose glyph ID wraps to 0
+            if start <= notdef_code <= end:
+                if start < notdef_code:
+                    ranges.append((start, notdef_code - 1))
+                if notdef_code < end:
+                    ranges.append((notdef_code + 1, end))
+            else:
+                ranges.append((start, end))
+            continue
+        base = range_offsets_pos + 2 * seg + range_offset
+        run_start = None
+        for code in range(start, end + 1):
+            offset = base + 2 * (code - start)
+            glyph_id = 0
+            if offset + 2 <= len(data):
+                glyph_id = (data[offset] << 8) | data[offset + 1]
+                if glyph_id:
+                    glyph_id = (glyph_id + delta) & 0xFFFF
+            if glyph_id and run_start is None:
+                run_start = code
+            elif not glyph_id and run_start is not None:
+                ranges.append((run_start, code - 1))
+                run_start = None
+        if run_start is not None:
+            ranges.append((run_start, end))
+    return ranges
+
+
+def read_codepoint_ranges(font_path: Path) -> CodepointRanges:
+    """Read the mapped codepoints of a font as sorted inclusive ranges.
+
+    Only the raw cmap table is read; format 4 and 12 subtables are decoded
+    directly into runs without building a per-codepoint mapping. Other
+    formats fall back to TTFont.getBestCmap().
+
+    Args:
+        font_path: Path to the font file
+
+    Returns:
+        Sorted, non-overlapping (first, last) codepoint ranges
+    """
+    with open(font_path, "rb") as f:
+        reader = SFNTReader(f, fontNumber=0)
+        cmap = reader["cmap"] if "cmap" in reader else b""
+    if len(cmap) >= 4:
+        (num_tables,) = struct.unpack(">H", cmap[2:4])
+        subtables = {}
+        for i in range(num_tables):
+            platform_id, encoding_id, offset = struct.unpack(
+                ">HHL", cmap[4 + 8 * i : 12 + 8 * i]
+            )
+            subtables.setdefault((platform_id, encoding_id), offset)
+        for key in _CMAP_PREFERENCES:
+            if key not in subtables:
+                continue
+            data = cmap[subtables[key] :]
+            (subtable_format,) = struct.unpack(">H", data[:2])
+            if subtable_format == 12:
+                return _merge_ranges(_format12_ranges(data))
+            if subtable_format == 4:
+                return _merge_ranges(_format4_ranges(data))
+            break
+
+    font = TTFont(font_path, lazy=True, fontNumber=0)
+    try:
+        best_cmap = font.getBestCmap() or {}
+    finally:
+        font.close()
+    return _merge_ranges([(code, code) for code in best_cmap])
+
+
+def get_font_codepoints(font_path: Path) -> Set[int]:
+    """Get the set of Unicode codepoints mapped by the font's cmap.
+
+    Args:
+        font_path: Path to the font file
+
+    Returns:
+        Set of codepoints the font maps to a glyph
+    """
+    codepoints = set()
+    for first, last in read_codepoint_ranges(font_path):
+        codepoints.update(range(first, last + 1))
+    return codepoints
+
+
+def get_font_characters(font_path: Path, lazy: bool = True) -> Set[str]:
     """Get a set of character names present in the font.
 
     Args:
         font_path: Path to the font file
+        lazy: Read only the tables that hold glyph names; False parses a full TTFont
 
     Returns:
         Set of character names in the font
     """
+    if lazy:
+        return set(read_glyph_names(font_path))
     font = TTFont(font_path)
     return set(font.getGlyphOrder())
 
@@ -38,12 +263,137 @@ def get_overlapping_characters(font1_path: Path, font2_path: Path) -> Set[str]:
     return chars1.intersection(chars2)
 
 
-def compare_fonts(font1_path: Path, font2_path: Path) -> None:
+def count_codepoints(ranges: CodepointRanges) -> int:
+    """Return the number of codepoints covered by ranges."""
+    return sum(last - first + 1 for first, last in ranges)
+
+
+def intersect_ranges(a: CodepointRanges, b: CodepointRanges) -> CodepointRanges:
+    """Intersect two sorted range lists in a single linear sweep."""
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        first = max(a[i][0], b[j][0])
+        last = min(a[i][1], b[j][1])
+        if first <= last:
+            result.append((first, last))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def subtract_ranges(a: CodepointRanges, b: CodepointRanges) -> CodepointRanges:
+    """Return the codepoints of a that are not in b, as sorted ranges."""
+    result = []
+    j = 0
+    for first, last in a:
+        while j < len(b) and b[j][1] < first:
+            j += 1
+        k = j
+        while k < len(b) and b[k][0] <= last:
+            if b[k][0] > first:
+                result.append((first, b[k][0] - 1))
+            first = max(first, b[k][1] + 1)
+            if first > last:
+                break
+            k += 1
+        if first <= last:
+            result.append((first, last))
+    return result
+
+
+def format_range(first: int, last: int) -> str:
+    """Format a codepoint range, e.g. "U+1F600–U+1F64F" or "U+0041"."""
+    if first == last:
+        return f"U+{first:04X}"
+    return f"U+{first:04X}–U+{last:04X}"
+
+
+def compare_codepoints(font1_path: Path, font2_path: Path) -> Dict[str, Any]:
+    """Compare the cmap coverage of two fonts.
+
+    Args:
+        font1_path: Path to the first font
+        font2_path: Path to the second font
+
+    Returns:
+        Report with per-font counts and the ranges covered by both fonts and by
+        only one of them
+    """
+    ranges1 = read_codepoint_ranges(font1_path)
+    ranges2 = read_codepoint_ranges(font2_path)
+    sets = {
+        "both": intersect_ranges(ranges1, ranges2),
+        "only_font1": subtract_ranges(ranges1, ranges2),
+        "only_font2": subtract_ranges(ranges2, ranges1),
+    }
+    return {
+        "font1": {"path": str(font1_path), "codepoints": count_codepoints(ranges1)},
+        "font2": {"path": str(font2_path), "codepoints": count_codepoints(ranges2)},
+        "summary": {name: count_codepoints(ranges) for name, ranges in sets.items()},
+        "ranges": {
+            name: [
+                {
+                    "first": f"U+{first:04X}",
+                    "last": f"U+{last:04X}",
+                    "count": last - first + 1,
+                    "label": format_range(first, last),
+                }
+                for first, last in ranges
+            ]
+            for name, ranges in sets.items()
+        },
+    }
+
+
+def write_codepoint_report(report: Dict[str, Any], output_format: str, out: TextIO) -> None:
+    """Write a compare_codepoints() report as text, JSON or CSV.
+
+    Args:
+        report: Report returned by compare_codepoints()
+        output_format: "text", "json" or "csv"
+        out: Stream to write to
+    """
+    if output_format == "json":
+        json.dump(report, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["set", "first", "last", "count"])
+        for name, ranges in report["ranges"].items():
+            for entry in ranges:
+                writer.writerow([name, entry["first"], entry["last"], entry["count"]])
+        return
+
+    font1, font2, summary = report["font1"], report["font2"], report["summary"]
+    out.write(f"\n1: {Path(font1['path']).name} ({font1['codepoints']} codepoints)\n")
+    out.write(f"2: {Path(font2['path']).name} ({font2['codepoints']} codepoints)\n")
+    titles = {"both": "In both fonts", "only_font1": "Only in 1", "only_font2": "Only in 2"}
+    for name, title in titles.items():
+        ranges = report["ranges"][name]
+        out.write(f"\n{title}: {summary[name]} codepoints in {len(ranges)} ranges\n")
+        for entry in ranges:
+            out.write(f"- {entry['label']} ({entry['count']})\n")
+
+
+def compare_fonts(
+    font1_path: Path,
+    font2_path: Path,
+    by: str = "glyphs",
+    output_format: str = "text",
+    out: Optional[TextIO] = None,
+) -> None:
     """Compare two fonts and print overlapping characters.
 
     Args:
         font1_path: Path to the first font
         font2_path: Path to the second font
+        by: "glyphs" compares glyph names, "codepoints" compares cmap coverage as ranges
+        output_format: "text", "json" or "csv" (codepoint comparison only)
+        out: Stream to write to, defaults to stdout
     """
     if not font1_path.exists():
         print(f"Error: Font file not found: {font1_path}", file=sys.stderr)
@@ -52,13 +402,22 @@ def compare_fonts(font1_path: Path, font2_path: Path) -> None:
         print(f"Error: Font file not found: {font2_path}", file=sys.stderr)
         sys.exit(1)
 
+    out = out or sys.stdout
+    if by == "codepoints":
+        report = compare_codepoints(font1_path, font2_path)
+        write_codepoint_report(report, output_format, out)
+        return
+    if output_format != "text":
+        print("Error: JSON and CSV output require codepoint comparison", file=sys.stderr)
+        sys.exit(1)
+
     overlapping = get_overlapping_characters(font1_path, font2_path)
-    print(f"\nFound {len(overlapping)} overlapping characters between:")
-    print(f"1: {font1_path.name}")
-    print(f"2: {font2_path.name}")
-    print("\nOverlapping characters:")
+    print(f"\nFound {len(overlapping)} overlapping characters between:", file=out)
+    print(f"1: {font1_path.name}", file=out)
+    print(f"2: {font2_path.name}", file=out)
+    print("\nOverlapping characters:", file=out)
     for char in sorted(overlapping):
-        print(f"- {char}")
+        print(f"- {char}", file=out)
 
 
 def main() -> None:
@@ -67,8 +426,20 @@ def main() -> None:
     )
     parser.add_argument("font1", type=Path, help="Path to the first font")
     parser.add_argument("font2", type=Path, help="Path to the second font")
+    parser.add_argument(
+        "--by",
+        choices=["glyphs", "codepoints"],
+        default="glyphs",
+        help="Compare glyph names or cmap codepoint coverage (default: glyphs)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json", "csv"],
+        default="text",
+        help="Output format for codepoint comparison (default: text)",
+    )
     args = parser.parse_args()
-    compare_fonts(args.font1, args.font2)
+    compare_fonts(args.font1, args.font2, by=args.by, output_format=args.format)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,304 @@
+"""Persistent codepoint coverage index for RoboTvar.
+
+Answers "which of our fonts renders this text?" without loading fonts. The
+cmap ranges and GSUB ligature sequences (ZWJ emoji, flags, skin tones) of
+every font are stored in a small SQLite database under robotvar/cache/,
+as compact arrays of codepoint runs. The index is updated incrementally:
+only fonts whose size, mtime and SHA-256 changed are parsed again.
+"""
+
+import bisect
+import csv
+import json
+import sqlite3
+import sys
+from array import array
+from fontTools.ttLib import TTFont
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, TextIO, Tuple
+
+from .compare_sources import CodepointRanges, read_codepoint_ranges
+from .coverage_matrix import default_font_dirs, find_fonts, font_label
+from .digest import file_digest
+
+DEFAULT_INDEX_PATH = Path(__file__).parent.parent / "cache" / "coverage.sqlite"
+
+# Bump whenever the indexed data or schema changes
+INDEX_VERSION = 1
+
+# Format controls and variation selectors render fine without a glyph
+IGNORABLE_CODEPOINTS = frozenset([0x09, 0x0A, 0x0D, 0x200C, 0x200D] + list(range(0xFE00, 0xFE10)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fonts (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    ranges BLOB NOT NULL,
+    sequences TEXT NOT NULL
+)
+"""
+
+
+def _pack_ranges(ranges: CodepointRanges) -> bytes:
+    return array("I", [value for run in ranges for value in run]).tobytes()
+
+
+def _unpack_ranges(blob: bytes) -> Tuple[array, array]:
+    values = array("I")
+    values.frombytes(blob)
+    return values[0::2], values[1::2]
+
+
+def read_emoji_sequences(font_path: Path) -> List[str]:
+    """Return the multi-codepoint sequences a font renders with GSUB ligatures.
+
+    Only ligatures whose every component glyph is mapped directly by the
+    cmap are reported, which covers ZWJ sequences, flags and skin tones in
+    emoji fonts.
+    """
+    font = TTFont(font_path, lazy=True)
+    try:
+        if "GSUB" not in font:
+            return []
+        glyph_codepoints: Dict[str, int] = {}
+        best_cmap = font.getBestCmap() or {}  # None without a Unicode cmap
+        for codepoint, glyph_name in sorted(best_cmap.items(), reverse=True):
+            glyph_codepoints[glyph_name] = codepoint
+
+        sequences: Set[str] = set()
+        gsub = font["GSUB"].table
+        for lookup in gsub.LookupList.Lookup if gsub.LookupList else []:
+            for subtable in lookup.SubTable:
+                if lookup.LookupType == 7:
+                    subtable = subtable.ExtSubTable
+                if not hasattr(subtable, "ligatures"):
+                    continue
+                for first_glyph, ligatures in subtable.ligatures.items():
+                    for ligature in ligatures:
+                        glyphs = [first_glyph] + list(ligature.Component)
+                        if all(glyph in glyph_codepoints for glyph in glyphs):
+                            sequences.add("".join(chr(glyph_codepoints[glyph]) for glyph in glyphs))
+        return sorted(sequences)
+    finally:
+        font.close()
+
+
+class CoverageIndex:
+    """SQLite-backed index of the codepoints and sequences every font covers.
+
+    Args:
+        index_path: SQLite database file, created if missing
+    """
+
+    def __init__(self, index_path: Path = DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(index_path))
+        (version,) = self._db.execute("PRAGMA user_version").fetchone()
+        if version != INDEX_VERSION:
+            self._db.execute("DROP TABLE IF EXISTS fonts")
+            self._db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        self._loaded: Optional[Dict[str, Tuple[array, array, Set[str]]]] = None
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "CoverageIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def update(self, fonts: Sequence[Path]) -> Tuple[int, int]:
+        """Bring the index in line with fonts, parsing only changed files.
+
+        Entries for font files that no longer exist are removed.
+
+        Returns:
+            Tuple of (fonts indexed again, fonts removed)
+        """
+        known = {
+            path: (size, mtime_ns, sha256)
+            for path, size, mtime_ns, sha256 in self._db.execute(
+                "SELECT path, size, mtime_ns, sha256 FROM fonts"
+            )
+        }
+        indexed = 0
+        seen = set()
+        for font_path in fonts:
+            path = str(font_path.resolve())
+            seen.add(path)
+            stat = font_path.stat()
+            entry = known.get(path)
+            if entry and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+                continue
+            digest = file_digest(font_path)
+            if entry and entry[2] == digest:
+                self._db.execute(
+                    "UPDATE fonts SET size = ?, mtime_ns = ? WHERE path = ?",
+                    (stat.st_size, stat.st_mtime_ns, path),
+                )
+                continue
+            ranges = read_codepoint_ranges(font_path)
+            sequences = read_emoji_sequences(font_path)
+            self._db.execute(
+                "INSERT OR REPLACE INTO fonts VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    digest,
+                    _pack_ranges(ranges),
+                    json.dumps(sequences, ensure_ascii=False),
+                ),
+            )
+            print(
+                f"🗂️  Indexed {font_label(font_path)}: {len(ranges)} ranges, {len(sequences)} sequences",
+                file=sys.stderr,
+            )
+            indexed += 1
+
+        removed = [path for path in known if path not in seen and not Path(path).is_file()]
+        self._db.executemany("DELETE FROM fonts WHERE path = ?", [(path,) for path in removed])
+        self._db.commit()
+        if indexed or removed:
+            self._loaded = None
+        return indexed, len(removed)
+
+    def _load(self) -> Dict[str, Tuple[array, array, Set[str]]]:
+        if self._loaded is None:
+            self._loaded = {}
+            for path, ranges, sequences in self._db.execute(
+                "SELECT path, ranges, sequences FROM fonts ORDER BY path"
+            ):
+                firsts, lasts = _unpack_ranges(ranges)
+                self._loaded[path] = (firsts, lasts, set(json.loads(sequences)))
+        return self._loaded
+
+    def fonts_for_codepoint(self, codepoint: int) -> List[str]:
+        """Return the paths of every indexed font that maps codepoint."""
+        found = []
+        for path, (firsts, lasts, _) in self._load().items():
+            i = bisect.bisect_right(firsts, codepoint) - 1
+            if i >= 0 and codepoint <= lasts[i]:
+                found.append(path)
+        return found
+
+    def query(self, text: str, fonts: Optional[Sequence[Path]] = None) -> Dict[str, Any]:
+        """Report which indexed fonts render every character and sequence of text.
+
+        Args:
+            text: Text to check
+            fonts: Only report these fonts, defaults to every indexed font
+
+        Returns:
+            Report with the distinct codepoints and known sequences found in the
+            text, and for every font the codepoints and sequences it lacks
+        """
+        indexed = self._load()
+        if fonts is not None:
+            paths = {str(font_path.resolve()) for font_path in fonts}
+            indexed = {path: entry for path, entry in indexed.items() if path in paths}
+        codepoints = sorted({ord(char) for char in text} - IGNORABLE_CODEPOINTS)
+
+        known_sequences: Set[str] = set().union(*(entry[2] for entry in indexed.values()))
+        max_length = max((len(sequence) for sequence in known_sequences), default=0)
+        found_sequences = set()
+        pos = 0
+        while pos < len(text):
+            for length in range(min(max_length, len(text) - pos), 1, -1):
+                if text[pos : pos + length] in known_sequences:
+                    found_sequences.add(text[pos : pos + length])
+                    pos += length
+                    break
+            else:
+                pos += 1
+
+        results = []
+        for path, (firsts, lasts, sequences) in indexed.items():
+            missing = []
+            for codepoint in codepoints:
+                i = bisect.bisect_right(firsts, codepoint) - 1
+                if i < 0 or codepoint > lasts[i]:
+                    missing.append(codepoint)
+            missing_sequences = sorted(found_sequences - sequences)
+            results.append(
+                {
+                    "path": path,
+                    "label": font_label(Path(path)),
+                    "complete": not missing and not missing_sequences,
+                    "missing": [f"U+{codepoint:04X}" for codepoint in missing],
+                    "missing_sequences": [
+                        " ".join(f"U+{ord(char):04X}" for char in sequence)
+                        for sequence in missing_sequences
+                    ],
+                }
+            )
+        results.sort(
+            key=lambda result: (len(result["missing"]) + len(result["missing_sequences"]), result["path"])
+        )
+        return {
+            "codepoints": len(codepoints),
+            "sequences": len(found_sequences),
+            "fonts": results,
+        }
+
+
+def write_query_report(report: Dict[str, Any], output_format: str, out: TextIO) -> None:
+    """Write a CoverageIndex.query() report as text or JSON (CSV lists one font per row)."""
+    if output_format == "json":
+        json.dump(report, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["font", "complete", "missing", "missing_sequences"])
+        for font in report["fonts"]:
+            writer.writerow(
+                [font["label"], font["complete"], " ".join(font["missing"]), ";".join(font["missing_sequences"])]
+            )
+        return
+
+    out.write(f"\n🔎 {report['codepoints']} codepoints, {report['sequences']} emoji sequences\n")
+    for font in report["fonts"]:
+        if font["complete"]:
+            out.write(f"✅ {font['label']}\n")
+            continue
+        lacking = len(font["missing"]) + len(font["missing_sequences"])
+        shown = ", ".join((font["missing"] + font["missing_sequences"])[:8])
+        more = f", … (+{lacking - 8})" if lacking > 8 else ""
+        out.write(f"❌ {font['label']}: missing {lacking}: {shown}{more}\n")
+
+
+def find_fonts_for_text(
+    text: str,
+    font_dirs: Optional[Sequence[Path]] = None,
+    index_path: Path = DEFAULT_INDEX_PATH,
+    output_format: str = "text",
+    out: Optional[TextIO] = None,
+) -> Dict[str, Any]:
+    """Update the coverage index and report which fonts render text.
+
+    Args:
+        text: Text to check
+        font_dirs: Directories (or font files) to index, defaults to the downloaded and merged fonts
+        index_path: SQLite database file of the index
+        output_format: "text", "json" or "csv"
+        out: Stream to write to, defaults to stdout
+
+    Returns:
+        Report returned by CoverageIndex.query()
+    """
+    fonts = find_fonts(font_dirs or default_font_dirs())
+    if not fonts:
+        print("Error: No fonts found to index", file=sys.stderr)
+        sys.exit(1)
+    with CoverageIndex(index_path) as index:
+        index.update(fonts)
+        report = index.query(text, fonts)
+    write_query_report(report, output_format, out or sys.stdout)
+    return report
@@ -0,0 +1,205 @@
+"""N-way font coverage audit for RoboTvar.
+
+Parses every font in a set of directories once, in parallel worker
+processes, and builds an N×N codepoint overlap matrix plus a report of
+which fonts cover which Unicode blocks.
+"""
+
+import bisect
+import csv
+import json
+import sys
+from fontTools.unicodedata import Blocks
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+
+from .compare_sources import (
+    CodepointRanges,
+    count_codepoints,
+    format_range,
+    intersect_ranges,
+    read_codepoint_ranges,
+)
+from .jobs import run_jobs
+
+FONT_SUFFIXES = (".ttf", ".otf")
+
+# Unicode blocks as sorted, non-overlapping inclusive ranges
+_BLOCK_STARTS = list(Blocks.RANGES)
+_BLOCK_RANGES = [
+    (start, (_BLOCK_STARTS[i + 1] - 1) if i + 1 < len(_BLOCK_STARTS) else 0x10FFFF)
+    for i, start in enumerate(_BLOCK_STARTS)
+]
+
+
+def default_font_dirs() -> List[Path]:
+    """Return the downloaded font folders and the merged fonts folder."""
+    package_dir = Path(__file__).parent.parent
+    fonts_dir = package_dir / "fonts"
+    return [
+        fonts_dir / "roboto",
+        fonts_dir / "dejavu",
+        fonts_dir / "tossface",
+        fonts_dir / "twemoji",
+        package_dir / "merged",
+    ]
+
+
+def find_fonts(font_dirs: Sequence[Path]) -> List[Path]:
+    """Return every .ttf/.otf file directly inside font_dirs, in a stable order."""
+    fonts = []
+    for directory in font_dirs:
+        if directory.is_file():
+            fonts.append(directory)
+        elif directory.is_dir():
+            fonts.extend(sorted(p for p in directory.iterdir() if p.suffix.lower() in FONT_SUFFIXES))
+    return fonts
+
+
+def block_coverage(ranges: CodepointRanges) -> Dict[int, int]:
+    """Count the codepoints of ranges in each Unicode block.
+
+    Returns:
+        Mapping of block index (into fontTools.unicodedata.Blocks) to covered codepoints
+    """
+    counts: Dict[int, int] = {}
+    # Every run of the intersection lies inside exactly one block
+    for first, last in intersect_ranges(ranges, _BLOCK_RANGES):
+        index = bisect.bisect_right(_BLOCK_STARTS, first) - 1
+        counts[index] = counts.get(index, 0) + last - first + 1
+    return counts
+
+
+def font_label(font_path: Path) -> str:
+    """Return a short "folder/file" label for a font path."""
+    return f"{font_path.parent.name}/{font_path.name}"
+
+
+def build_coverage_matrix(fonts: Sequence[Path], jobs: Optional[int] = 0) -> Dict[str, Any]:
+    """Parse fonts in parallel and build the overlap matrix and block report.
+
+    Args:
+        fonts: Font files to audit
+        jobs: Number of worker processes, 0 for one per CPU
+
+    Returns:
+        Report with the fonts, the N×N overlap matrix (codepoints mapped by both
+        fonts) and per-block coverage counts of every font
+    """
+    ranges = run_jobs(
+        [(font_label(path), read_codepoint_ranges, (path,), {}) for path in fonts],
+        jobs=jobs,
+    )
+    labels = [font_label(path) for path in fonts]
+    counts = [count_codepoints(font_ranges) for font_ranges in ranges]
+
+    matrix = []
+    for i, ranges_i in enumerate(ranges):
+        row = []
+        for j, ranges_j in enumerate(ranges):
+            if j < i:
+                row.append(matrix[j][i])
+            elif j == i:
+                row.append(counts[i])
+            else:
+                row.append(count_codepoints(intersect_ranges(ranges_i, ranges_j)))
+        matrix.append(row)
+
+    per_font_blocks = [block_coverage(font_ranges) for font_ranges in ranges]
+    blocks = []
+    for index in sorted(set().union(*per_font_blocks)) if per_font_blocks else []:
+        first, last = _BLOCK_RANGES[index]
+        blocks.append(
+            {
+                "name": Blocks.VALUES[index],
+                "first": f"U+{first:04X}",
+                "last": f"U+{last:04X}",
+                "size": last - first + 1,
+                "coverage": {
+                    labels[i]: font_blocks[index]
+                    for i, font_blocks in enumerate(per_font_blocks)
+                    if index in font_blocks
+                },
+            }
+        )
+
+    return {
+        "fonts": [
+            {"label": label, "path": str(path), "codepoints": count}
+            for label, path, count in zip(labels, fonts, counts)
+        ],
+        "matrix": matrix,
+        "blocks": blocks,
+    }
+
+
+def write_coverage_report(report: Dict[str, Any], output_format: str, out: TextIO) -> None:
+    """Write a build_coverage_matrix() report as text, JSON or CSV.
+
+    Args:
+        report: Report returned by build_coverage_matrix()
+        output_format: "text", "json" or "csv"
+        out: Stream to write to
+    """
+    labels = [font["label"] for font in report["fonts"]]
+    if output_format == "json":
+        json.dump(report, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["font"] + labels)
+        for label, row in zip(labels, report["matrix"]):
+            writer.writerow([label] + row)
+        writer.writerow([])
+        writer.writerow(["block", "first", "last", "size"] + labels)
+        for block in report["blocks"]:
+            writer.writerow(
+                [block["name"], block["first"], block["last"], block["size"]]
+                + [block["coverage"].get(label, 0) for label in labels]
+            )
+        return
+
+    out.write(f"\nCoverage of {len(labels)} fonts\n")
+    for i, font in enumerate(report["fonts"], start=1):
+        out.write(f"{i:>3}: {font['label']} ({font['codepoints']} codepoints)\n")
+    out.write("\nShared codepoints (row ∩ column):\n")
+    width = max([len(str(value)) for row in report["matrix"] for value in row] + [3])
+    out.write("     " + " ".join(f"{j:>{width}}" for j in range(1, len(labels) + 1)) + "\n")
+    for i, row in enumerate(report["matrix"], start=1):
+        out.write(f"{i:>3}: " + " ".join(f"{value:>{width}}" for value in row) + "\n")
+
+    out.write("\nUnicode blocks:\n")
+    for block in report["blocks"]:
+        first, last = int(block["first"][2:], 16), int(block["last"][2:], 16)
+        out.write(f"- {block['name']} ({format_range(first, last)}, {block['size']})\n")
+        for label in labels:
+            if label in block["coverage"]:
+                covered = block["coverage"][label]
+                out.write(f"    {label}: {covered} ({covered * 100 / block['size']:.0f}%)\n")
+
+
+def audit_fonts(
+    font_dirs: Optional[Sequence[Path]] = None,
+    output_format: str = "text",
+    jobs: Optional[int] = 0,
+    out: Optional[TextIO] = None,
+) -> Dict[str, Any]:
+    """Audit the codepoint coverage of every font in font_dirs.
+
+    Args:
+        font_dirs: Directories (or font files) to audit, defaults to default_font_dirs()
+        output_format: "text", "json" or "csv"
+        jobs: Number of worker processes, 0 for one per CPU
+        out: Stream to write to, defaults to stdout
+
+    Returns:
+        Report returned by build_coverage_matrix()
+    """
+    fonts = find_fonts(font_dirs or default_font_dirs())
+    if not fonts:
+        print("Error: No fonts found to audit", file=sys.stderr)
+        sys.exit(1)
+    report = build_coverage_matrix(fonts, jobs=jobs)
+    write_coverage_report(report, output_format, out or sys.stdout)
+    return report
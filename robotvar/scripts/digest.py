@@ -0,0 +1,36 @@
+"""File hashing and writing helpers for RoboTvar."""
+
+import functools
+import hashlib
+import os
+from pathlib import Path
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file, read in chunks.
+
+    Args:
+        path: File to hash
+        chunk_size: Number of bytes read per chunk
+
+    Returns:
+        Hex-encoded SHA-256 digest of the file contents
+    """
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def default_file_mode() -> int:
+    """Return the permissions a newly created file gets under the process umask.
+
+    tempfile.mkstemp() creates files readable by their owner only; files
+    written through it are chmod'ed to this mode before they replace the
+    real file, so they end up like any other output.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
@@ -4,9 +4,16 @@ Downloads Roboto and TossFace fonts from their respective GitHub repositories.
 """
 
 import asyncio
+import hashlib
+import json
+import os
+import time
 from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
 import httpx
 
+from .digest import file_digest
+
 # Convert GitHub URLs to raw content URLs
 ROBOTO_BASE_URL = (
     "https://raw.githubusercontent.com/googlefonts/roboto-2/main/src/hinted"
@@ -36,28 +43,285 @@ DEJAVU_FONTS = {
 
 import asyncio
 
-async def download_font(client: httpx.AsyncClient, url: str, output_path: Path, retries: int = 3) -> None:
-    """Download a font file from the given URL with retries and progress messages."""
+DOWNLOAD_MANIFEST_NAME = "download-manifest.json"
+
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_CONNECTIONS = 8
+KEEPALIVE_EXPIRY = 30.0  # seconds an idle connection is kept for reuse
+
+CHUNK_SIZE = 64 * 1024
+PROGRESS_STEP = 25  # percent between progress messages
+PROGRESS_STEP_BYTES = 1024 * 1024  # when the size is unknown
+
+
+def _format_size(num_bytes: int) -> str:
+    """Format a byte count for progress messages."""
+    if num_bytes < 1024 * 1024:
+        return f"{num_bytes / 1024:.1f} KiB"
+    return f"{num_bytes / (1024 * 1024):.1f} MiB"
+
+
+def print_throughput_summary(stats: List[Tuple[str, str, int, float]]) -> None:
+    """Print bytes received, time and throughput of every download.
+
+    Args:
+        stats: (font path, status, bytes received, seconds) per download
+    """
+    if not stats:
+        return
+    print("\nDownload summary:")
+    width = max(len(relative_path) for relative_path, _, _, _ in stats)
+    total_bytes = 0
+    for relative_path, status, transferred, seconds in stats:
+        total_bytes += transferred
+        rate = transferred / seconds if seconds > 0 else 0.0
+        print(
+            f"  {relative_path:<{width}}  {status:<12}  {_format_size(transferred):>10}  "
+            f"{seconds:6.2f} s  {_format_size(int(rate))}/s"
+        )
+    print(f"  Total received: {_format_size(total_bytes)}")
+
+
+def get_font_sources() -> Dict[str, str]:
+    """Return the download URL of every required font by its path under fonts/."""
+    sources = {f"roboto/{filename}": url for filename, url in ROBOTO_FONTS.items()}
+    sources["tossface/TossFaceFontWeb.otf"] = TOSSFACE_URL
+    sources["twemoji/Twemoji.Mozilla.ttf"] = TWEMOJI_URL
+    sources.update({f"dejavu/{filename}": url for filename, url in DEJAVU_FONTS.items()})
+    return sources
+
+
+def load_download_manifest(fonts_dir: Path) -> Dict[str, dict]:
+    """Load the download manifest of a fonts directory.
+
+    Returns:
+        Mapping of font path under fonts_dir to its ETag, Last-Modified, size and SHA-256
+    """
+    try:
+        data = json.loads((fonts_dir / DOWNLOAD_MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data.get("files", {})
+
+
+def save_download_manifest(fonts_dir: Path, files: Dict[str, dict]) -> None:
+    """Atomically write the download manifest of a fonts directory."""
+    path = fonts_dir / DOWNLOAD_MANIFEST_NAME
+    part_path = path.with_name(path.name + ".part")
+    part_path.write_text(
+        json.dumps({"files": dict(sorted(files.items()))}, indent=2) + "\n",
+        encoding="utf-8",
+    )
+    os.replace(part_path, path)
+
+
+def _parse_content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """Return (first byte, complete length) of a Content-Range header, None where unknown.
+
+    Handles "bytes 100-199/1234", "bytes 100-199/*" and "bytes */1234".
+    """
+    if not value or not value.startswith("bytes "):
+        return None, None
+    byte_range, _, length = value[len("bytes "):].partition("/")
+    first, _, _ = byte_range.partition("-")
+    try:
+        start = int(first) if first != "*" else None
+        complete = int(length) if length not in ("", "*") else None
+    except ValueError:
+        return None, None
+    return start, complete
+
+
+def verify_cached_file(output_path: Path, entry: Optional[dict]) -> bool:
+    """Return True if output_path matches the size and SHA-256 recorded in entry."""
+    if not entry or not output_path.is_file():
+        return False
+    if output_path.stat().st_size != entry.get("size"):
+        return False
+    return file_digest(output_path) == entry.get("sha256")
+
+
+async def download_font(
+    client: httpx.AsyncClient,
+    url: str,
+    output_path: Path,
+    retries: int = 3,
+    cached: Optional[dict] = None,
+) -> dict:
+    """Download a font file from the given URL with retries and progress messages.
+
+    The response is streamed in chunks to a ".part" file next to output_path,
+    which is renamed into place only once the download is complete, so memory
+    use does not grow with the font size and an interrupted download never
+    leaves a truncated font behind. A retry after a broken transfer resumes the
+    ".part" file with an HTTP Range request guarded by If-Range. A ".part"
+    file that already holds the whole body is finalized instead, and one the
+    server cannot resume (416, or a 206 starting elsewhere) is started over.
+
+    Args:
+        client: Async HTTP client
+        url: URL to download from
+        output_path: Where to save the downloaded font
+        retries: Number of attempts before giving up
+        cached: Download manifest entry of output_path from a previous run. If
+            the local file still matches its checksum, a conditional request is
+            sent and a 304 response keeps the local file.
+
+    Returns:
+        Manifest entry for the file (url, etag, last_modified, size, sha256) plus
+        status, transferred (bytes received over all attempts) and seconds
+    """
+    # Identity encoding keeps Range offsets equal to file offsets
+    headers = {"Accept": "application/octet-stream", "Accept-Encoding": "identity"}
+    if cached and cached.get("url") == url and verify_cached_file(output_path, cached):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    part_path = output_path.with_name(output_path.name + ".part")
+    part_path.unlink(missing_ok=True)
+    validator = None  # strong ETag or Last-Modified of the partial body, for If-Range
+    etag = last_modified = None
+    expected_size = None  # complete length of the body, once known
+    transferred = 0
+    started = time.perf_counter()
     attempt = 0
     while attempt < retries:
         try:
-            print(f"📥 Starting download: {output_path.name} (attempt {attempt + 1})")
-            response = await client.get(
+            request_headers = dict(headers)
+            resume_from = part_path.stat().st_size if validator and part_path.exists() else 0
+            if resume_from and resume_from == expected_size:
+                # The failure came after the last chunk; nothing left to fetch
+                entry = {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "size": resume_from,
+                    "sha256": file_digest(part_path),
+                }
+                os.replace(part_path, output_path)
+                print(f"✅ Downloaded: {output_path.name} ({_format_size(resume_from)})")
+                return dict(
+                    entry,
+                    status="downloaded",
+                    transferred=transferred,
+                    seconds=time.perf_counter() - started,
+                )
+            if resume_from:
+                # A partial body means the server already answered 200, no conditionals
+                request_headers.pop("If-None-Match", None)
+                request_headers.pop("If-Modified-Since", None)
+                request_headers["Range"] = f"bytes={resume_from}-"
+                request_headers["If-Range"] = validator
+                print(
+                    f"📥 Resuming download: {output_path.name} at {_format_size(resume_from)} "
+                    f"(attempt {attempt + 1})"
+                )
+            else:
+                print(f"📥 Starting download: {output_path.name} (attempt {attempt + 1})")
+            async with client.stream(
+                "GET",
                 url,
                 follow_redirects=True,
-                headers={"Accept": "application/octet-stream"},
+                headers=request_headers,
                 timeout=20.0,
+            ) as response:
+                if response.status_code == 304:
+                    print(f"✅ Up to date: {output_path.name}")
+                    return dict(
+                        cached,
+                        status="not-modified",
+                        transferred=transferred,
+                        seconds=time.perf_counter() - started,
+                    )
+                if resume_from and response.status_code == 416:
+                    # Nothing left past resume_from: either the .part file is
+                    # already complete or the body changed size
+                    _, complete = _parse_content_range(response.headers.get("Content-Range"))
+                    if complete == resume_from:
+                        expected_size = complete  # finalized at the top of the loop
+                    else:
+                        print(f"↩️  Cannot resume {output_path.name}, starting over")
+                        validator = None
+                        part_path.unlink(missing_ok=True)
+                    continue
+                response.raise_for_status()
+                sha = hashlib.sha256()
+                if resume_from and response.status_code == 206:
+                    range_start, _ = _parse_content_range(
+                        response.headers.get("Content-Range")
+                    )
+                    if range_start != resume_from:
+                        validator = None  # the .part file is dropped below
+                        raise httpx.RemoteProtocolError(
+                            f"resumed at byte {range_start}, expected {resume_from}",
+                            request=response.request,
+                        )
+                    mode = "ab"
+                    with open(part_path, "rb") as f:
+                        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                            sha.update(chunk)
+                else:
+                    mode = "wb"
+                    resume_from = 0
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if etag and not etag.startswith("W/"):
+                    validator = etag
+                else:
+                    validator = last_modified
+                content_length = int(response.headers.get("Content-Length", 0))
+                total = resume_from + content_length if content_length else None
+                if total:
+                    expected_size = total
+                written = resume_from
+                next_report = PROGRESS_STEP if total else PROGRESS_STEP_BYTES
+                try:
+                    with open(part_path, mode) as f:
+                        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                            f.write(chunk)
+                            sha.update(chunk)
+                            written += len(chunk)
+                            downloaded = resume_from + response.num_bytes_downloaded
+                            if total:
+                                percent = downloaded * 100 // total
+                                if percent >= next_report and downloaded < total:
+                                    print(f"   {output_path.name}: {percent}% of {_format_size(total)}")
+                                    next_report = (percent // PROGRESS_STEP + 1) * PROGRESS_STEP
+                            elif downloaded >= next_report:
+                                print(f"   {output_path.name}: {_format_size(downloaded)}")
+                                next_report += PROGRESS_STEP_BYTES
+                finally:
+                    transferred += response.num_bytes_downloaded
+                if total and written != total:
+                    raise httpx.ReadError(
+                        f"incomplete body: got {written} of {total} bytes", request=response.request
+                    )
+                entry = {
+                    "url": url,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "size": written,
+                    "sha256": sha.hexdigest(),
+                }
+            os.replace(part_path, output_path)
+            print(f"✅ Downloaded: {output_path.name} ({_format_size(written)})")
+            return dict(
+                entry,
+                status="downloaded",
+                transferred=transferred,
+                seconds=time.perf_counter() - started,
             )
-            response.raise_for_status()
-            output_path.write_bytes(response.content)
-            print(f"✅ Downloaded: {output_path.name}")
-            return
         except Exception as e:
+            if not validator:
+                part_path.unlink(missing_ok=True)  # cannot be resumed safely
             attempt += 1
             print(f"⚠️  Failed: {output_path.name} (attempt {attempt}) — {e}")
             if attempt < retries:
                 await asyncio.sleep(2 * attempt)  # exponential backoff
             else:
+                part_path.unlink(missing_ok=True)
                 print(f"❌ Giving up on: {output_path.name}")
                 raise
 
@@ -79,54 +343,120 @@ async def download_font(client: httpx.AsyncClient, url: str, output_path: Path,
 #         raise
 
 
-async def download_all_fonts() -> None:
-    """Download all required fonts asynchronously."""
+async def download_all_fonts(
+    fonts_dir: Optional[Path] = None,
+    sources: Optional[Dict[str, str]] = None,
+    force: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    on_ready: Optional[Callable[[str], None]] = None,
+) -> Dict[str, dict]:
+    """Download all required fonts asynchronously.
+
+    Files recorded in the download manifest are only fetched again if the
+    server reports a change (ETag/Last-Modified) or the local copy no longer
+    matches its recorded checksum. All downloads share one client, so
+    connections to the same host are kept alive and reused.
+
+    Args:
+        fonts_dir: Directory to download into, defaults to robotvar/fonts
+        sources: URL of every font by its path under fonts_dir, defaults to get_font_sources()
+        force: Ignore the download manifest and fetch every file
+        max_concurrency: Maximum number of downloads in flight at once
+        max_connections: Size of the client's connection pool
+        on_ready: Called from the event loop with the path under fonts_dir of
+            every font as soon as it is in place (downloaded or up to date)
+
+    Returns:
+        Updated download manifest entries by font path
+    """
+    fonts_dir = fonts_dir or (Path(__file__).parent.parent / "fonts")
+    sources = sources if sources is not None else get_font_sources()
+
     # Create necessary directories
-    fonts_dir = Path(__file__).parent.parent / "fonts"
-    roboto_dir = fonts_dir / "roboto"
-    tossface_dir = fonts_dir / "tossface"
-    twemoji_dir = fonts_dir / "twemoji"
-    dejavu_dir = fonts_dir / "dejavu"
-
-    for directory in [fonts_dir, roboto_dir, tossface_dir, twemoji_dir, dejavu_dir]:
-        directory.mkdir(parents=True, exist_ok=True)
-
-    async with httpx.AsyncClient() as client:
-        # Download Roboto fonts
-        roboto_tasks = [
-            download_font(client, url, roboto_dir / filename)
-            for filename, url in ROBOTO_FONTS.items()
-        ]
-
-        # Download TossFace font
-        tossface_task = download_font(
-            client, TOSSFACE_URL, tossface_dir / "TossFaceFontWeb.otf"
-        )
+    fonts_dir.mkdir(parents=True, exist_ok=True)
+    for relative_path in sources:
+        (fonts_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
 
-        # # Wait for all downloads to complete
-        # await asyncio.gather(tossface_task, *roboto_tasks)
-        
-        
-        # Download Twemoji font
-        twemoji_task = download_font(
-            client, TWEMOJI_URL, twemoji_dir / "Twemoji.Mozilla.ttf"
-        )
+    manifest = {} if force else load_download_manifest(fonts_dir)
 
-        # Download DejaVu fonts
-        dejavu_tasks = [
-            download_font(client, url, dejavu_dir / filename)
-            for filename, url in DEJAVU_FONTS.items()
-        ]
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
 
+    async def bounded_download(relative_path: str) -> dict:
+        async with semaphore:
+            result = await download_font(
+                client,
+                sources[relative_path],
+                fonts_dir / relative_path,
+                cached=manifest.get(relative_path),
+            )
+        if on_ready is not None:
+            on_ready(relative_path)
+        return result
+
+    limits = httpx.Limits(
+        max_connections=max(1, max_connections),
+        max_keepalive_connections=max(1, max_connections),
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+    async with httpx.AsyncClient(limits=limits) as client:
+        relative_paths = list(sources)
+        tasks = [bounded_download(relative_path) for relative_path in relative_paths]
 
         # Wait for all downloads to complete
-        await asyncio.gather(tossface_task, twemoji_task, *roboto_tasks, *dejavu_tasks)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = []
+    downloaded = 0
+    stats = []
+    for relative_path, result in zip(relative_paths, results):
+        if isinstance(result, BaseException):
+            errors.append(result)
+            manifest.pop(relative_path, None)
+            continue
+        status = result.pop("status")
+        transferred = result.pop("transferred")
+        seconds = result.pop("seconds")
+        if status == "downloaded":
+            downloaded += 1
+        stats.append((relative_path, status, transferred, seconds))
+        manifest[relative_path] = result
+    save_download_manifest(fonts_dir, manifest)
 
+    print_throughput_summary(stats)
+
+    print(
+        f"Downloaded {downloaded} fonts, "
+        f"{len(relative_paths) - downloaded - len(errors)} already up to date"
+    )
+    if errors:
+        raise errors[0]
+    return manifest
+
+
+def download_fonts(
+    force: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    source: Optional[str] = None,
+) -> None:
+    """Entry point for font downloading.
+
+    Args:
+        force: Ignore the download manifest and fetch every file
+        max_concurrency: Maximum number of downloads in flight at once
+        max_connections: Size of the HTTP connection pool
+        source: Font source, see sources.get_provider(); defaults to the upstream URLs
+    """
+    from .sources import get_provider
 
-def download_fonts() -> None:
-    """Entry point for font downloading."""
     try:
-        asyncio.run(download_all_fonts())
+        provider = get_provider(
+            source,
+            max_concurrency=max_concurrency,
+            max_connections=max_connections,
+        )
+        provider.fetch(force=force)
         print("All fonts downloaded successfully!")
     except Exception as e:
         print(f"Error downloading fonts: {e}")
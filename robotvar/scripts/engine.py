@@ -0,0 +1,556 @@
+"""Shared merge engine for RoboTvar.
+
+Both merge modes (Roboto + TossFace in merge.py, DejaVuSans + Twemoji in
+merge_dejavu_and_twemoji.py) run the same pipeline of stages:
+
+    load_base, load_emoji  parse the input fonts
+    scale                  pick the emoji scale factor
+    select                 find the emoji glyphs to add and extend the glyph order
+    convert                convert (and scale) emoji outlines to TrueType glyphs, or
+                           copy compiled glyf data verbatim when no scaling is needed
+    metrics                copy scaled advance widths and side bearings
+    cmap                   build the merged format 12 cmap
+    write                  extend head/hhea/maxp with the added glyphs and save the
+                           merged font, keeping untouched base data as raw bytes
+
+Every stage is a function taking the MergeContext and is timed on its own
+with PhaseTimer. A mode customizes the pipeline by passing replacement
+stages (or a glyph converter) to MergeEngine, so a faster implementation
+of one stage can be plugged in without copying the rest.
+"""
+
+import struct
+from fontTools.misc.arrayTools import intRect
+from fontTools.ttLib import TTFont, newTable
+from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+from fontTools.ttLib.tables._g_l_y_f import (
+    ARG_1_AND_2_ARE_WORDS,
+    MORE_COMPONENTS,
+    WE_HAVE_A_SCALE,
+    WE_HAVE_A_TWO_BY_TWO,
+    WE_HAVE_AN_X_AND_Y_SCALE,
+    WE_HAVE_INSTRUCTIONS,
+    Glyph,
+)
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .glyph_cache import DEFAULT_CACHE_DIR, GlyphCache, shadowed_digest, shared_cache
+from .mapped import open_font
+from .timings import PhaseTimer
+
+Stage = Callable[["MergeContext"], None]
+GlyphConverter = Callable[[str], Optional[Glyph]]
+
+STAGE_NAMES = ("load_base", "load_emoji", "scale", "select", "convert", "metrics", "cmap", "write")
+
+# Tables copied from the emoji font for color and sequence support
+EMOJI_TABLES = ("GSUB", "GPOS", "GDEF", "COLR", "CPAL")
+
+
+class MergeContext:
+    """State shared by the stages of one merge.
+
+    Args:
+        base_font_path: Path to the base font variant
+        emoji_font_path: Path to the emoji font
+        output_path: Where to save the merged font
+        cache: Converted glyph cache
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        use_mmap: Memory-map the input fonts and load them lazily
+    """
+
+    def __init__(
+        self,
+        base_font_path: Path,
+        emoji_font_path: Path,
+        output_path: Path,
+        cache: GlyphCache,
+        codepoints: Optional[Set[int]] = None,
+        use_mmap: bool = False,
+    ):
+        self.base_font_path = base_font_path
+        self.emoji_font_path = emoji_font_path
+        self.output_path = output_path
+        self.cache = cache
+        self.codepoints = codepoints
+        self.use_mmap = use_mmap
+        self.base_font: Optional[TTFont] = None
+        self.emoji_font: Optional[TTFont] = None
+        self.emoji_digest: Optional[str] = None
+        self.scale = 1.0
+        self.new_glyphs: Set[str] = set()
+        self.shadowed_digest = ""
+        self.glyph_order: List[str] = []
+        self.converted: List[str] = []
+        # Set by MergeEngine from its options
+        self.make_converter: Optional[Callable[["MergeContext"], GlyphConverter]] = None
+        self.emoji_cmap_wins = False
+
+
+def load_base(ctx: MergeContext) -> None:
+    """Parse the base font."""
+    print(f"Loading base font: {ctx.base_font_path.name}")
+    ctx.base_font = open_font(ctx.base_font_path, use_mmap=ctx.use_mmap, lazy=True)
+    ctx.base_font["glyf"]
+
+
+def load_emoji(ctx: MergeContext) -> None:
+    """Load the emoji font through the glyph cache, subset to ctx.codepoints if set."""
+    print(f"Loading emoji font: {ctx.emoji_font_path.name}")
+    ctx.emoji_font, ctx.emoji_digest = ctx.cache.load_font(
+        ctx.emoji_font_path, ctx.codepoints, use_mmap=ctx.use_mmap
+    )
+    if ctx.codepoints is not None:
+        cmap = ctx.emoji_font.getBestCmap() or {}
+        if not any(codepoint in cmap for codepoint in ctx.codepoints):
+            raise ValueError(
+                f"None of the {len(ctx.codepoints)} selected codepoints are in "
+                f"{ctx.emoji_font_path.name}"
+            )
+        print(
+            f"Subset emoji font to {len(ctx.emoji_font.getGlyphOrder())} glyphs "
+            f"for {len(ctx.codepoints)} codepoints"
+        )
+
+
+def match_units_per_em(ctx: MergeContext) -> None:
+    """Scale emoji by the ratio of the base and emoji fonts' unitsPerEm."""
+    ctx.scale = ctx.base_font["head"].unitsPerEm / ctx.emoji_font["head"].unitsPerEm
+    print(f"Scaling emoji glyphs by: {ctx.scale:.3f}")
+
+
+def keep_emoji_units(ctx: MergeContext) -> None:
+    """Copy emoji outlines and metrics unscaled."""
+    ctx.scale = 1.0
+
+
+def select_new_glyphs(ctx: MergeContext) -> None:
+    """Add emoji glyphs missing from the base font and copy the emoji layout tables."""
+    base_glyphs = set(ctx.base_font.getGlyphOrder())
+    emoji_glyphs = set(ctx.emoji_font.getGlyphOrder())
+    ctx.new_glyphs = emoji_glyphs - base_glyphs
+    ctx.shadowed_digest = shadowed_digest(emoji_glyphs & base_glyphs)
+    print(f"Found {len(ctx.new_glyphs)} new glyphs to add")
+
+    for table_tag in EMOJI_TABLES:
+        if table_tag in ctx.emoji_font:
+            if table_tag in ctx.base_font:
+                del ctx.base_font[table_tag]
+            ctx.base_font[table_tag] = ctx.emoji_font[table_tag]
+
+    ctx.glyph_order = ctx.base_font.getGlyphOrder() + list(ctx.new_glyphs)
+    ctx.base_font.setGlyphOrder(ctx.glyph_order)
+
+
+def convert_glyphs(ctx: MergeContext) -> None:
+    """Convert every new glyph with the mode's converter, through the glyph cache."""
+    print("Converting and copying emoji glyphs...")
+    convert = ctx.make_converter(ctx)
+    cache = ctx.cache
+    glyf = ctx.base_font["glyf"]
+    hits_before = cache.hits
+    for glyph_name in ctx.new_glyphs:
+        ttf_glyph = cache.get_glyph(
+            ctx.emoji_digest,
+            ctx.shadowed_digest,
+            glyph_name,
+            ctx.scale,
+            lambda: convert(glyph_name),
+        )
+        if ttf_glyph:
+            glyf[glyph_name] = ttf_glyph
+            ctx.converted.append(glyph_name)
+    print(f"✅ Successfully added {len(ctx.converted)} emoji glyphs")
+    print(f"♻️  Reused {cache.hits - hits_before} glyphs from the conversion cache")
+    cache.flush()
+
+
+def _strip_simple_instructions(data: bytes) -> bytes:
+    """Return simple glyph data with an empty instruction block.
+
+    data may be any bytes-like object, e.g. a view of a memory-mapped font.
+    """
+    (num_contours,) = struct.unpack(">h", data[:2])
+    pos = 10 + 2 * num_contours
+    (length,) = struct.unpack(">H", data[pos : pos + 2])
+    if not length:
+        return data
+    return b"".join((data[:pos], b"\0\0", data[pos + 2 + length :]))
+
+
+def remap_composite_data(data: bytes, glyph_ids: Dict[int, int]) -> Optional[bytes]:
+    """Rewrite the component glyph IDs of compiled composite glyph data.
+
+    Trailing instructions are dropped. Returns data unchanged when every
+    component keeps its ID and there are no instructions, and None when a
+    component has no new ID.
+
+    Args:
+        data: Compiled composite glyph
+        glyph_ids: New glyph ID of every old component glyph ID that may be kept
+    """
+    out = bytearray(data)
+    changed = False
+    pos = 10
+    while True:
+        flags, glyph_id = struct.unpack(">HH", out[pos : pos + 4])
+        new_id = glyph_ids.get(glyph_id)
+        if new_id is None:
+            return None
+        if new_id != glyph_id:
+            struct.pack_into(">H", out, pos + 2, new_id)
+            changed = True
+        if flags & WE_HAVE_INSTRUCTIONS:
+            struct.pack_into(">H", out, pos, flags & ~WE_HAVE_INSTRUCTIONS)
+            changed = True
+        pos += 4 + (4 if flags & ARG_1_AND_2_ARE_WORDS else 2)
+        if flags & WE_HAVE_A_SCALE:
+            pos += 2
+        elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+            pos += 4
+        elif flags & WE_HAVE_A_TWO_BY_TWO:
+            pos += 8
+        if not flags & MORE_COMPONENTS:
+            break
+    return bytes(out[:pos]) if changed else data
+
+
+def copy_raw_glyphs(ctx: MergeContext) -> None:
+    """Copy the compiled glyf data of every new glyph without decompiling it.
+
+    Only valid when the emoji font has glyf outlines and ctx.scale is 1.0.
+    Composite component IDs are remapped to the merged glyph order where they
+    differ, and hinting instructions are dropped as in converted glyphs.
+    Composites with a component shadowed by a base font glyph of the same
+    name go through the mode's converter instead, which decomposes them.
+    """
+    print("Copying emoji glyf data verbatim...")
+    emoji_glyf = ctx.emoji_font["glyf"]
+    emoji_order = ctx.emoji_font.getGlyphOrder()
+    merged_ids = {name: i for i, name in enumerate(ctx.glyph_order)}
+    glyph_ids = {
+        i: merged_ids[name] for i, name in enumerate(emoji_order) if name in ctx.new_glyphs
+    }
+    glyphs = ctx.base_font["glyf"].glyphs
+    composites = 0
+    shadowed = []
+    for glyph_name in ctx.new_glyphs:
+        source = emoji_glyf.glyphs.get(glyph_name)
+        if source is None:
+            continue
+        if hasattr(source, "data"):
+            data = source.data
+        else:
+            data = source.compile(emoji_glyf, recalcBBoxes=False)
+        if data:
+            if struct.unpack(">h", data[:2])[0] < 0:
+                data = remap_composite_data(data, glyph_ids)
+                if data is None:
+                    shadowed.append(glyph_name)
+                    continue
+                composites += 1
+            else:
+                data = _strip_simple_instructions(data)
+        # The select stage already put glyph_name in the glyph order
+        glyphs[glyph_name] = Glyph(data)
+        ctx.converted.append(glyph_name)
+    print(f"✅ Copied {len(ctx.converted)} emoji glyphs ({composites} composites)")
+
+    if shadowed:
+        convert = ctx.make_converter(ctx)
+        glyf = ctx.base_font["glyf"]
+        for glyph_name in shadowed:
+            ttf_glyph = ctx.cache.get_glyph(
+                ctx.emoji_digest,
+                ctx.shadowed_digest,
+                glyph_name,
+                ctx.scale,
+                lambda: convert(glyph_name),
+            )
+            if ttf_glyph:
+                glyf[glyph_name] = ttf_glyph
+                ctx.converted.append(glyph_name)
+        print(f"✅ Decomposed {len(shadowed)} composites with shadowed components")
+        ctx.cache.flush()
+
+
+def copy_or_convert_glyphs(ctx: MergeContext) -> None:
+    """Copy glyf data verbatim when no scaling is needed, otherwise convert it."""
+    if ctx.scale == 1.0 and "glyf" in ctx.emoji_font:
+        copy_raw_glyphs(ctx)
+    else:
+        convert_glyphs(ctx)
+
+
+def copy_metrics(ctx: MergeContext) -> None:
+    """Copy the horizontal metrics of converted glyphs, scaled like their outlines."""
+    if "hmtx" not in ctx.emoji_font:
+        return
+    emoji_metrics = ctx.emoji_font["hmtx"].metrics
+    base_hmtx = ctx.base_font["hmtx"]
+    scale = ctx.scale
+    for glyph_name in ctx.converted:
+        if glyph_name in emoji_metrics:
+            aw, lsb = emoji_metrics[glyph_name]
+            base_hmtx[glyph_name] = (int(aw * scale), int(lsb * scale))
+
+
+def build_cmap(
+    base_font: TTFont,
+    emoji_font: TTFont,
+    new_glyphs: Set[str],
+    emoji_wins: bool = False,
+):
+    """Build a format 12 cmap with the base font mappings and the new emoji glyphs.
+
+    Args:
+        base_font: Font the emoji glyphs are merged into
+        emoji_font: Source emoji font
+        new_glyphs: Names of the emoji glyphs added to the base font
+        emoji_wins: Emoji mappings replace base mappings of the same codepoint
+
+    Returns:
+        New cmap table
+    """
+    new_cmap = newTable("cmap")
+    new_cmap.tableVersion = 0
+
+    format12 = CmapSubtable.newSubtable(12)
+    format12.platformID = 3
+    format12.platEncID = 10
+    format12.language = 0
+    format12.cmap = {}
+
+    for table in base_font["cmap"].tables:
+        if table.isUnicode():
+            format12.cmap.update(table.cmap)
+    for table in emoji_font["cmap"].tables:
+        if table.isUnicode():
+            for code, name in table.cmap.items():
+                if name in new_glyphs and (emoji_wins or code not in format12.cmap):
+                    format12.cmap[code] = name
+
+    new_cmap.tables = [format12]
+    return new_cmap
+
+
+def merge_cmaps(ctx: MergeContext) -> None:
+    """Replace the base cmap with the merged format 12 cmap."""
+    ctx.base_font["cmap"] = build_cmap(
+        ctx.base_font, ctx.emoji_font, ctx.new_glyphs, emoji_wins=ctx.emoji_cmap_wins
+    )
+
+
+def _prepare_write(ctx: MergeContext) -> None:
+    base_font = ctx.base_font
+    if "maxp" in base_font:
+        base_font["maxp"].numGlyphs = len(ctx.glyph_order)
+
+    # Verify consistency
+    if "glyf" in base_font:
+        assert len(base_font.getGlyphOrder()) == len(base_font["glyf"].glyphs)
+    else:
+        cff = base_font["CFF "].cff
+        assert len(base_font.getGlyphOrder()) == len(cff[cff.fontNames[0]].CharStrings)
+    ctx.output_path.parent.mkdir(parents=True, exist_ok=True)
+
+
+def write_font(ctx: MergeContext) -> None:
+    """Update maxp, check the glyph count and save the merged font.
+
+    Every glyph is recompiled so fontTools can recalculate all bounding
+    boxes and maxp values.
+    """
+    _prepare_write(ctx)
+    print(f"Saving merged font to: {ctx.output_path}")
+    ctx.base_font.save(ctx.output_path)
+
+
+def new_glyph_bounds(ctx: MergeContext) -> Dict[str, Tuple[int, int, int, int]]:
+    """Return the (xMin, yMin, xMax, yMax) of every added glyph with an outline.
+
+    glyf data copied verbatim keeps the bounds in its header; other glyf
+    glyphs get their bounds recalculated and CFF charstrings are measured.
+    """
+    base_font = ctx.base_font
+    bounds = {}
+    if "glyf" in base_font:
+        glyf = base_font["glyf"]
+        for glyph_name in ctx.converted:
+            glyph = glyf.glyphs[glyph_name]
+            if hasattr(glyph, "data"):
+                num_contours, *box = struct.unpack(">hhhhh", glyph.data[:10])
+                if num_contours:
+                    bounds[glyph_name] = tuple(box)
+            elif glyph.numberOfContours:
+                glyph.recalcBounds(glyf)
+                bounds[glyph_name] = (glyph.xMin, glyph.yMin, glyph.xMax, glyph.yMax)
+    else:
+        cff = base_font["CFF "].cff
+        charstrings = cff[cff.fontNames[0]].CharStrings
+        for glyph_name in ctx.converted:
+            box = charstrings[glyph_name].calcBounds(charstrings)
+            if box is not None:
+                bounds[glyph_name] = intRect(box)
+    return bounds
+
+
+def _update_glyf_maxp(ctx: MergeContext) -> None:
+    """Raise the glyf maxp maxima to cover the added glyphs."""
+    glyf = ctx.base_font["glyf"]
+    maxp = ctx.base_font["maxp"]
+    for glyph_name in ctx.converted:
+        glyph = glyf.glyphs[glyph_name]
+        if hasattr(glyph, "data"):
+            (num_contours,) = struct.unpack(">h", glyph.data[:2])
+            if num_contours > 0:
+                (last_point,) = struct.unpack(">H", glyph.data[8 + 2 * num_contours : 10 + 2 * num_contours])
+                maxp.maxPoints = max(maxp.maxPoints, last_point + 1)
+                maxp.maxContours = max(maxp.maxContours, num_contours)
+                continue
+            glyph = glyf[glyph_name]
+        if glyph.numberOfContours > 0:
+            points, contours = glyph.getMaxpValues()
+            maxp.maxPoints = max(maxp.maxPoints, points)
+            maxp.maxContours = max(maxp.maxContours, contours)
+        elif glyph.isComposite():
+            points, contours, depth = glyph.getCompositeMaxpValues(glyf)
+            maxp.maxCompositePoints = max(maxp.maxCompositePoints, points)
+            maxp.maxCompositeContours = max(maxp.maxCompositeContours, contours)
+            maxp.maxComponentElements = max(maxp.maxComponentElements, len(glyph.components))
+            maxp.maxComponentDepth = max(maxp.maxComponentDepth, depth)
+
+
+def write_font_fast(ctx: MergeContext) -> None:
+    """Save the merged font without recompiling the base font's glyphs.
+
+    Base glyph data and every table no stage touched are written as the
+    raw bytes read from the base font. The head bounding box, hhea extents
+    and maxp maxima are extended with the added glyphs only, so they are
+    only as accurate as the base font's own values.
+    """
+    _prepare_write(ctx)
+    base_font = ctx.base_font
+    bounds = new_glyph_bounds(ctx)
+    metrics = base_font["hmtx"].metrics
+
+    head = base_font["head"]
+    hhea = base_font["hhea"]
+    hhea.advanceWidthMax = max(advance for advance, _ in metrics.values())
+    for glyph_name, (x_min, y_min, x_max, y_max) in bounds.items():
+        head.xMin, head.yMin = min(head.xMin, x_min), min(head.yMin, y_min)
+        head.xMax, head.yMax = max(head.xMax, x_max), max(head.yMax, y_max)
+        advance, lsb = metrics[glyph_name]
+        if lsb != x_min:
+            head.flags &= ~0x2
+        extent = lsb + x_max - x_min
+        hhea.minLeftSideBearing = min(hhea.minLeftSideBearing, lsb)
+        hhea.minRightSideBearing = min(hhea.minRightSideBearing, advance - extent)
+        hhea.xMaxExtent = max(hhea.xMaxExtent, extent)
+
+    if "glyf" in base_font:
+        _update_glyf_maxp(ctx)
+    else:
+        cff = base_font["CFF "].cff
+        cff[cff.fontNames[0]].FontBBox = [head.xMin, head.yMin, head.xMax, head.yMax]
+
+    print(f"Saving merged font to: {ctx.output_path}")
+    base_font.recalcBBoxes = False
+    base_font.save(ctx.output_path)
+
+
+DEFAULT_STAGES: Dict[str, Stage] = {
+    "load_base": load_base,
+    "load_emoji": load_emoji,
+    "scale": match_units_per_em,
+    "select": select_new_glyphs,
+    "convert": convert_glyphs,
+    "metrics": copy_metrics,
+    "cmap": merge_cmaps,
+    "write": write_font_fast,
+}
+
+
+class MergeEngine:
+    """Runs the merge stages in order, timing each one.
+
+    Args:
+        make_converter: Returns the glyph converter for a context whose fonts
+            are loaded and whose scale is set; used by the default convert stage
+        emoji_cmap_wins: Emoji mappings replace base mappings of the same codepoint
+        stages: Replacement stage functions by stage name
+    """
+
+    def __init__(
+        self,
+        make_converter: Callable[[MergeContext], GlyphConverter],
+        emoji_cmap_wins: bool = False,
+        stages: Optional[Dict[str, Stage]] = None,
+    ):
+        unknown = set(stages or {}) - set(STAGE_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown merge stages: {', '.join(sorted(unknown))}")
+        self.make_converter = make_converter
+        self.emoji_cmap_wins = emoji_cmap_wins
+        self.stages = dict(DEFAULT_STAGES, **(stages or {}))
+
+    def with_stages(self, **stages: Stage) -> "MergeEngine":
+        """Return a copy of this engine with some stages replaced."""
+        return MergeEngine(
+            self.make_converter,
+            emoji_cmap_wins=self.emoji_cmap_wins,
+            stages=dict(self.stages, **stages),
+        )
+
+    def run(self, ctx: MergeContext, timer: Optional[PhaseTimer] = None) -> MergeContext:
+        """Run every stage on ctx, timing each with timer if given."""
+        timer = timer or PhaseTimer(ctx.output_path.name, enabled=False)
+        ctx.make_converter = self.make_converter
+        ctx.emoji_cmap_wins = self.emoji_cmap_wins
+        for name in STAGE_NAMES:
+            with timer.phase(name):
+                self.stages[name](ctx)
+        return ctx
+
+    def merge(
+        self,
+        base_font_path: Path,
+        emoji_font_path: Path,
+        output_path: Path,
+        cache: Optional[GlyphCache] = None,
+        cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+        codepoints: Optional[Set[int]] = None,
+        profile: bool = False,
+        trace_memory: bool = True,
+        use_mmap: bool = False,
+    ) -> Optional[Dict[str, Any]]:
+        """Merge one base font variant with the emoji font.
+
+        Args:
+            base_font_path: Path to the base font variant
+            emoji_font_path: Path to the emoji font
+            output_path: Where to save the merged font
+            cache: Converted glyph cache, defaults to the per-process shared cache
+            cache_dir: On-disk glyph cache used by the shared cache, None to disable
+            codepoints: Only merge emoji for these codepoints and their GSUB closure
+            profile: Record wall time and memory peak of every stage
+            trace_memory: Include the tracemalloc peak when profiling
+            use_mmap: Memory-map the input fonts and load them lazily, so
+                parallel merges share the emoji font's pages
+
+        Returns:
+            Stage timings (see PhaseTimer.report()) if profile is set, else None
+        """
+        ctx = MergeContext(
+            base_font_path,
+            emoji_font_path,
+            output_path,
+            cache or shared_cache(cache_dir),
+            codepoints,
+            use_mmap,
+        )
+        timer = PhaseTimer(output_path.name, enabled=profile, trace_memory=trace_memory)
+        self.run(ctx, timer)
+        print("✅ Font merge completed!")
+        return timer.report() if profile else None
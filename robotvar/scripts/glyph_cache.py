@@ -0,0 +1,363 @@
+"""Converted emoji glyph cache for RoboTvar.
+
+Emoji outlines are the same for every base font variant, only the scale
+depends on the base font's unitsPerEm, and whether a composite is
+decomposed depends on which emoji glyph names the base font already has.
+The cache keeps parsed emoji fonts and converted glyphs keyed by (emoji
+font digest, shadowed names digest, glyph name, scale) so a build converts
+each emoji once instead of once per variant.
+
+Converted glyphs are also persisted to robotvar/cache/glyphs/ as compiled
+glyf data, one bundle per (emoji font digest, shadowed names digest, scale,
+converter version), so later runs load them instead of drawing every
+charstring again. The directory is capped in size and evicts least
+recently used bundles.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from fontTools import version as fonttools_version
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables._g_l_y_f import Glyph
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .digest import default_file_mode, file_digest
+from .mapped import open_font
+
+GlyphKey = Tuple[str, str, str, float]
+BundleKey = Tuple[str, str, float]
+
+# Bump whenever the glyph conversion code changes its output
+CONVERTER_VERSION = 3
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / "cache" / "glyphs"
+DEFAULT_MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+_BUNDLE_MAGIC = b"RVGC1\n"
+_BUNDLE_SUFFIX = ".glyphs"
+
+
+def _scale_key(scale: float) -> float:
+    """Normalize a scale factor so equal ratios computed differently share a key."""
+    return round(scale, 9)
+
+
+def shadowed_digest(shadowed: Iterable[str]) -> str:
+    """Return a digest of the emoji glyph names that the base font already has.
+
+    Converters decompose composites whose components are shadowed by base
+    font glyphs, so converted glyphs are only shared between base fonts that
+    shadow the same names.
+    """
+    names = "\n".join(sorted(shadowed))
+    return hashlib.sha256(names.encode("utf-8")).hexdigest()[:16]
+
+
+class _GlyphOrderTable:
+    """Minimal stand-in for a glyf table, resolving component glyph IDs."""
+
+    def __init__(self, glyph_order: List[str]):
+        self.glyphOrder = glyph_order
+        self._ids = {name: i for i, name in enumerate(glyph_order)}
+
+    def getGlyphID(self, glyph_name: str) -> int:
+        return self._ids[glyph_name]
+
+    def getGlyphName(self, glyph_id: int) -> str:
+        return self.glyphOrder[glyph_id]
+
+
+def encode_glyph(glyph: Glyph, glyf_table: _GlyphOrderTable) -> bytes:
+    """Compile a converted glyph to glyf data.
+
+    Component references are encoded against the emoji font's glyph order.
+    Composite bounds are left at zero; they are recalculated when the merged
+    font is saved.
+    """
+    if glyph.isComposite():
+        for attr in ("xMin", "yMin", "xMax", "yMax"):
+            if not hasattr(glyph, attr):
+                setattr(glyph, attr, 0)
+    elif glyph.numberOfContours:
+        glyph.recalcBounds(None)
+    return glyph.compile(glyf_table, recalcBBoxes=False)
+
+
+def decode_glyph(data: bytes, glyf_table: _GlyphOrderTable) -> Glyph:
+    """Decompile glyf data produced by encode_glyph()."""
+    glyph = Glyph(data)
+    glyph.expand(glyf_table)
+    return glyph
+
+
+class GlyphCache:
+    """Cache of parsed emoji fonts and converted glyphs.
+
+    Args:
+        cache_dir: Directory for persisted glyph bundles, None for memory only
+        max_bytes: Size cap of cache_dir; least recently used bundles are evicted
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[Path] = None,
+        max_bytes: int = DEFAULT_MAX_CACHE_BYTES,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.fonts: Dict[str, TTFont] = {}
+        self.subset_fonts: Dict[Tuple[str, FrozenSet[int]], TTFont] = {}
+        self.glyphs: Dict[GlyphKey, Optional[Glyph]] = {}
+        self.hits = 0
+        self.misses = 0
+        self._loaded_bundles: Set[BundleKey] = set()
+        self._dirty_bundles: Set[BundleKey] = set()
+
+    def load_font(
+        self, font_path: Path, codepoints: Optional[Set[int]] = None, use_mmap: bool = False
+    ) -> Tuple[TTFont, str]:
+        """Return the parsed emoji font and its digest, parsing it only once.
+
+        Args:
+            font_path: Path to the emoji font
+            codepoints: Subset the font to these codepoints and their GSUB closure
+            use_mmap: Memory-map the font and load it lazily (see mapped.open_font()).
+                Only the first load of a font (or of a subset) decides how it is opened.
+
+        Returns:
+            Tuple of (font, SHA-256 digest of the full font file). Subsetting keeps
+            glyph names and outlines, so the digest still keys converted glyphs.
+        """
+        digest = file_digest(font_path)
+        font = self.fonts.get(digest)
+        if font is None:
+            font = open_font(font_path, use_mmap=use_mmap)
+            self.fonts[digest] = font
+        if codepoints is None:
+            return font, digest
+
+        key = (digest, frozenset(codepoints))
+        subset_font = self.subset_fonts.get(key)
+        if subset_font is None:
+            from .subset import subset_emoji_font
+
+            # Subsetting works in place, so subset a separately opened copy
+            subset_font = subset_emoji_font(open_font(font_path, use_mmap=use_mmap), codepoints)
+            self.subset_fonts[key] = subset_font
+        return subset_font, digest
+
+    def get_glyph(
+        self,
+        digest: str,
+        shadowed: str,
+        glyph_name: str,
+        scale: float,
+        convert: Callable[[], Optional[Glyph]],
+    ) -> Optional[Glyph]:
+        """Return a converted glyph, calling convert() only on a cache miss.
+
+        Args:
+            digest: Digest of the emoji font the glyph comes from
+            shadowed: shadowed_digest() of the emoji glyphs the base font has
+            glyph_name: Name of the glyph in the emoji font
+            scale: Scale factor applied during conversion
+            convert: Callable producing the converted glyph (or None)
+
+        Returns:
+            Converted glyph or None if conversion failed
+        """
+        scale = _scale_key(scale)
+        key = (digest, shadowed, glyph_name, scale)
+        if key not in self.glyphs:
+            self._load_bundle(digest, shadowed, scale)
+        if key in self.glyphs:
+            self.hits += 1
+            return self.glyphs[key]
+        self.misses += 1
+        glyph = convert()
+        self.glyphs[key] = glyph
+        self._dirty_bundles.add((digest, shadowed, scale))
+        return glyph
+
+    def flush(self) -> None:
+        """Persist newly converted glyphs to cache_dir and enforce the size cap."""
+        if self.cache_dir is None or not self._dirty_bundles:
+            self._dirty_bundles.clear()
+            return
+        for digest, shadowed, scale in sorted(self._dirty_bundles):
+            self._write_bundle(digest, shadowed, scale)
+        self._dirty_bundles.clear()
+        self.evict()
+
+    def evict(self) -> None:
+        """Delete least recently used bundles until cache_dir fits max_bytes."""
+        if self.cache_dir is None or not self.cache_dir.is_dir():
+            return
+        bundles = []
+        for path in self.cache_dir.glob(f"*{_BUNDLE_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            bundles.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in bundles)
+        for _, size, path in sorted(bundles):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                print(f"🧹 Evicted glyph cache bundle: {path.name}")
+            except OSError:
+                pass
+
+    def carry_over(self, old_digest: str, new_digest: str, glyph_names: Set[str]) -> int:
+        """Reuse converted glyphs of an earlier version of an emoji font.
+
+        Args:
+            old_digest: Digest of the earlier font version
+            new_digest: Digest of the changed font
+            glyph_names: Glyphs whose outlines are the same in both versions
+
+        Returns:
+            Number of converted glyphs reused
+        """
+        carried = 0
+        for (digest, shadowed, glyph_name, scale), glyph in list(self.glyphs.items()):
+            if digest == old_digest and glyph_name in glyph_names:
+                self.glyphs.setdefault((new_digest, shadowed, glyph_name, scale), glyph)
+                self._dirty_bundles.add((new_digest, shadowed, scale))
+                carried += 1
+        return carried
+
+    def retain_fonts(self, digests: Set[str]) -> None:
+        """Drop in-memory fonts and glyphs of every emoji font digest not in digests."""
+        for digest in set(self.fonts) - digests:
+            del self.fonts[digest]
+        for key in [key for key in self.subset_fonts if key[0] not in digests]:
+            del self.subset_fonts[key]
+        for key in [key for key in self.glyphs if key[0] not in digests]:
+            del self.glyphs[key]
+        self._loaded_bundles = {key for key in self._loaded_bundles if key[0] in digests}
+        self._dirty_bundles = {key for key in self._dirty_bundles if key[0] in digests}
+
+    def clear(self) -> None:
+        """Drop all in-memory fonts and glyphs; persisted bundles are kept."""
+        self.fonts.clear()
+        self.subset_fonts.clear()
+        self.glyphs.clear()
+        self.hits = 0
+        self.misses = 0
+        self._loaded_bundles.clear()
+        self._dirty_bundles.clear()
+
+    def _bundle_path(self, digest: str, shadowed: str, scale: float) -> Path:
+        key = f"{digest}:{shadowed}:{scale!r}:{CONVERTER_VERSION}:{fonttools_version}"
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.cache_dir / f"{name}{_BUNDLE_SUFFIX}"
+
+    def _load_bundle(self, digest: str, shadowed: str, scale: float) -> None:
+        if self.cache_dir is None or (digest, shadowed, scale) in self._loaded_bundles:
+            return
+        self._loaded_bundles.add((digest, shadowed, scale))
+        path = self._bundle_path(digest, shadowed, scale)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return
+        try:
+            glyphs = self._decode_bundle(raw)
+        except Exception as e:
+            print(f"⚠️  Ignoring unreadable glyph cache bundle {path.name}: {e}")
+            return
+        for glyph_name, glyph in glyphs.items():
+            self.glyphs[(digest, shadowed, glyph_name, scale)] = glyph
+        try:
+            os.utime(path)  # mark as recently used for LRU eviction
+        except OSError:
+            pass
+        print(f"📦 Loaded {len(glyphs)} converted glyphs from cache")
+
+    def _write_bundle(self, digest: str, shadowed: str, scale: float) -> None:
+        font = self.fonts.get(digest)
+        if font is None:
+            return
+        glyf_table = _GlyphOrderTable(font.getGlyphOrder())
+        entries = []
+        chunks = []
+        for (glyph_digest, glyph_shadowed, glyph_name, glyph_scale), glyph in self.glyphs.items():
+            if (glyph_digest, glyph_shadowed, glyph_scale) != (digest, shadowed, scale):
+                continue
+            if glyph is None:
+                entries.append([glyph_name, None])
+                continue
+            data = encode_glyph(glyph, glyf_table)
+            entries.append([glyph_name, len(data)])
+            chunks.append(data)
+
+        header = json.dumps(
+            {"glyph_order": glyf_table.glyphOrder, "glyphs": entries},
+            separators=(",", ":"),
+        ).encode("utf-8")
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._bundle_path(digest, shadowed, scale)
+        fd, tmp_name = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_BUNDLE_MAGIC)
+                f.write(struct.pack(">I", len(header)))
+                f.write(header)
+                for data in chunks:
+                    f.write(data)
+            os.chmod(tmp_name, default_file_mode())
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except OSError:
+                pass
+            raise
+        print(f"💾 Saved {len(entries)} converted glyphs to cache")
+
+    @staticmethod
+    def _decode_bundle(raw: bytes) -> Dict[str, Optional[Glyph]]:
+        if not raw.startswith(_BUNDLE_MAGIC):
+            raise ValueError("bad magic")
+        offset = len(_BUNDLE_MAGIC)
+        (header_size,) = struct.unpack_from(">I", raw, offset)
+        offset += 4
+        header = json.loads(raw[offset : offset + header_size].decode("utf-8"))
+        offset += header_size
+        glyf_table = _GlyphOrderTable(header["glyph_order"])
+        glyphs = {}
+        for glyph_name, size in header["glyphs"]:
+            if size is None:
+                glyphs[glyph_name] = None
+                continue
+            glyphs[glyph_name] = decode_glyph(raw[offset : offset + size], glyf_table)
+            offset += size
+        if offset != len(raw):
+            raise ValueError("truncated bundle")
+        return glyphs
+
+
+_shared_caches: Dict[Optional[Path], GlyphCache] = {}
+
+
+def shared_cache(cache_dir: Optional[Path] = DEFAULT_CACHE_DIR) -> GlyphCache:
+    """Return the per-process cache for cache_dir, shared by every merge.
+
+    Args:
+        cache_dir: Directory for persisted glyph bundles, None for memory only
+
+    Returns:
+        GlyphCache instance reused across calls (one per worker with --jobs)
+    """
+    cache = _shared_caches.get(cache_dir)
+    if cache is None:
+        cache = _shared_caches[cache_dir] = GlyphCache(cache_dir=cache_dir)
+    return cache
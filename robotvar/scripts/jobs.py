@@ -0,0 +1,167 @@
+"""Parallel job runner for RoboTvar.
+
+Spreads independent font merges over a process pool while keeping the
+reported order deterministic and falling back to serial execution when a
+pool cannot be used. Jobs can also be submitted one at a time as their
+inputs become ready (see pipeline.py) and collected with wait_jobs().
+Progress and failures go to stderr, so they never mix with reports that
+callers write to stdout.
+"""
+
+import os
+import sys
+import traceback
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+# (label, function, positional args, keyword args)
+Job = Tuple[str, Callable[..., Any], tuple, dict]
+
+
+class MergeJobsError(RuntimeError):
+    """Raised when one or more jobs failed.
+
+    Attributes:
+        failures: List of (label, formatted traceback) for every failed job
+    """
+
+    def __init__(self, failures: List[Tuple[str, str]]):
+        self.failures = failures
+        labels = ", ".join(label for label, _ in failures)
+        super().__init__(f"{len(failures)} merge job(s) failed: {labels}")
+
+
+def resolve_jobs(jobs: Optional[int], job_count: int) -> int:
+    """Return the number of worker processes to use.
+
+    Args:
+        jobs: Requested worker count; None or values below 1 mean "all CPUs"
+        job_count: Number of jobs that will be run
+
+    Returns:
+        Worker count, never more than the number of jobs
+    """
+    if jobs is None or jobs < 1:
+        jobs = os.cpu_count() or 1
+    return max(1, min(jobs, job_count))
+
+
+def _run_job(func: Callable[..., Any], args: tuple, kwargs: dict) -> Tuple[bool, Any]:
+    """Run a single job, turning failures into a picklable traceback string."""
+    try:
+        return True, func(*args, **kwargs)
+    except Exception:
+        return False, traceback.format_exc()
+
+
+def _run_serial(job_list: Sequence[Job]) -> List[Tuple[bool, Any]]:
+    return [_run_job(func, args, kwargs) for _, func, args, kwargs in job_list]
+
+
+def _run_parallel(job_list: Sequence[Job], workers: int) -> List[Tuple[bool, Any]]:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_run_job, func, args, kwargs)
+            for _, func, args, kwargs in job_list
+        ]
+        # Collect in submission order so reports do not depend on scheduling
+        return [future.result() for future in futures]
+
+
+def run_jobs(job_list: Sequence[Job], jobs: Optional[int] = 1) -> List[Any]:
+    """Run jobs serially or over a process pool.
+
+    Args:
+        job_list: Jobs to run, as (label, function, args, kwargs) tuples
+        jobs: Number of worker processes; 1 runs everything in-process
+
+    Returns:
+        Job results in the same order as job_list
+
+    Raises:
+        MergeJobsError: If any job raised; all other jobs still run to completion
+    """
+    if not job_list:
+        return []
+
+    workers = resolve_jobs(jobs, len(job_list))
+    outcomes = None
+    if workers > 1:
+        print(f"Running {len(job_list)} jobs on {workers} worker processes", file=sys.stderr)
+        try:
+            outcomes = _run_parallel(job_list, workers)
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            print(
+                f"⚠️  Process pool unavailable ({e}), falling back to serial execution",
+                file=sys.stderr,
+            )
+    if outcomes is None:
+        outcomes = _run_serial(job_list)
+
+    return _collect_results(job_list, outcomes)
+
+
+def _collect_results(job_list: Sequence[Job], outcomes: Sequence[Tuple[bool, Any]]) -> List[Any]:
+    results = []
+    failures = []
+    for (label, _, _, _), (ok, value) in zip(job_list, outcomes):
+        if ok:
+            results.append(value)
+        else:
+            print(f"❌ {label} failed:\n{value}", file=sys.stderr)
+            failures.append((label, value))
+            results.append(None)
+
+    if failures:
+        raise MergeJobsError(failures)
+    return results
+
+
+def create_executor(jobs: Optional[int], job_count: int) -> Executor:
+    """Return a pool to submit jobs to one at a time with submit_job().
+
+    Jobs always run off the calling thread, so the caller stays free to do
+    other work (e.g. downloads) meanwhile. A single worker is a background
+    thread: as with run_jobs(), the jobs stay in-process, without process
+    start-up or pickling, and can be debugged. More workers use a process
+    pool, falling back to a single background thread when a process pool
+    cannot be used.
+
+    Args:
+        jobs: Requested worker count, see resolve_jobs()
+        job_count: Maximum number of jobs that will be submitted
+    """
+    workers = resolve_jobs(jobs, job_count)
+    if workers == 1:
+        return ThreadPoolExecutor(max_workers=1)
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except (OSError, NotImplementedError) as e:
+        print(
+            f"⚠️  Process pool unavailable ({e}), running jobs on a background thread",
+            file=sys.stderr,
+        )
+        return ThreadPoolExecutor(max_workers=1)
+
+
+def submit_job(executor: Executor, job: Job) -> Future:
+    """Start a job on executor; collect it with wait_jobs()."""
+    _, func, args, kwargs = job
+    return executor.submit(_run_job, func, args, kwargs)
+
+
+def wait_jobs(job_list: Sequence[Job], futures: Sequence[Future]) -> List[Any]:
+    """Wait for submitted jobs and return their results in the same order as job_list.
+
+    Raises:
+        MergeJobsError: If any job raised or its worker died; all other jobs
+            still run to completion
+    """
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result())
+        except Exception:
+            outcomes.append((False, traceback.format_exc()))
+    return _collect_results(job_list, outcomes)
@@ -0,0 +1,210 @@
+"""Build manifest for incremental RoboTvar merges.
+
+Records, for every merged font in an output directory, the hashes of its
+input fonts, the robotvar, merge code and fontTools versions and the merge
+options it was built with. A variant whose record still matches is skipped on the
+next run.
+"""
+
+import json
+import os
+import tempfile
+from fontTools import version as fonttools_version
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .. import __version__
+from .digest import default_file_mode, file_digest
+from .glyph_cache import CONVERTER_VERSION
+from .jobs import Job, MergeJobsError, run_jobs
+
+MANIFEST_NAME = "robotvar-build.json"
+MANIFEST_VERSION = 1
+
+# Bump whenever the merge code writes different bytes for the same inputs
+# and options; glyph conversion changes are tracked by CONVERTER_VERSION
+MERGE_VERSION = 1
+
+# (output path, build record, job)
+PlannedJob = Tuple[Path, Dict[str, Any], Job]
+
+
+def load_manifest(output_dir: Path) -> Dict[str, Any]:
+    """Load the build manifest of an output directory.
+
+    Args:
+        output_dir: Directory containing merged fonts
+
+    Returns:
+        Mapping of output file name to its build record, empty if missing or unreadable
+    """
+    path = output_dir / MANIFEST_NAME
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return data.get("outputs", {})
+
+
+def save_manifest(output_dir: Path, outputs: Dict[str, Any]) -> None:
+    """Atomically write the build manifest of an output directory.
+
+    Args:
+        output_dir: Directory containing merged fonts
+        outputs: Mapping of output file name to its build record
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    data = {"version": MANIFEST_VERSION, "outputs": dict(sorted(outputs.items()))}
+    fd, tmp_name = tempfile.mkstemp(dir=output_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+        os.chmod(tmp_name, default_file_mode())
+        os.replace(tmp_name, output_dir / MANIFEST_NAME)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def build_record(
+    inputs: Dict[str, Path],
+    options: Optional[Dict[str, Any]] = None,
+    digests: Optional[Dict[Path, str]] = None,
+) -> Dict[str, Any]:
+    """Describe how an output font is built.
+
+    Args:
+        inputs: Input fonts by role, e.g. {"base": ..., "emoji": ...}
+        options: Merge options that affect the output
+        digests: Already computed file digests, reused instead of re-hashing
+
+    Returns:
+        JSON-serializable build record
+    """
+    digests = digests if digests is not None else {}
+    record_inputs = {}
+    for role, path in sorted(inputs.items()):
+        if path not in digests:
+            digests[path] = file_digest(path)
+        record_inputs[role] = {"file": path.name, "sha256": digests[path]}
+    return {
+        "inputs": record_inputs,
+        "robotvar": __version__,
+        "merge": MERGE_VERSION,
+        "converter": CONVERTER_VERSION,
+        "fonttools": fonttools_version,
+        "options": options or {},
+    }
+
+
+def is_up_to_date(
+    outputs: Dict[str, Any], output_path: Path, record: Dict[str, Any]
+) -> bool:
+    """Return True if output_path exists and was built from the same record.
+
+    Args:
+        outputs: Loaded manifest outputs
+        output_path: Merged font that would be written
+        record: Build record for the pending merge
+    """
+    return output_path.exists() and outputs.get(output_path.name) == record
+
+
+def select_stale(
+    outputs: Dict[str, Any],
+    planned: Sequence[PlannedJob],
+    force: bool = False,
+) -> List[PlannedJob]:
+    """Return the planned jobs whose outputs are stale, reporting the others as skipped.
+
+    Args:
+        outputs: Loaded manifest outputs
+        planned: (output path, build record, job) for every variant
+        force: Treat every variant as stale
+    """
+    stale = []
+    for output_path, record, job in planned:
+        if not force and is_up_to_date(outputs, output_path, record):
+            print(f"⏭️  Skipping {output_path.name} (inputs unchanged)")
+        else:
+            stale.append((output_path, record, job))
+    return stale
+
+
+def run_recorded(
+    output_dir: Path,
+    stale: Sequence[PlannedJob],
+    run: Callable[[List[Job]], List[Any]],
+) -> List[Tuple[Path, Any]]:
+    """Run stale jobs with run() and record them in the manifest.
+
+    Args:
+        output_dir: Directory containing merged fonts and the manifest
+        stale: (output path, build record, job) of every variant to rebuild
+        run: Runs the jobs and returns their results in order, e.g. run_jobs()
+
+    Returns:
+        (output path, job result) of every rebuilt variant
+
+    Raises:
+        MergeJobsError: If any merge failed; successful merges are still recorded
+    """
+    try:
+        results = run([job for _, _, job in stale])
+    except MergeJobsError as e:
+        _record_results(output_dir, stale, {label for label, _ in e.failures})
+        raise
+    _record_results(output_dir, stale, set())
+    return [(output_path, result) for (output_path, _, _), result in zip(stale, results)]
+
+
+def run_stale_jobs(
+    output_dir: Path,
+    planned: Sequence[PlannedJob],
+    jobs: Optional[int] = 1,
+    force: bool = False,
+) -> List[Tuple[Path, Any]]:
+    """Run the merge jobs whose outputs are stale and record them in the manifest.
+
+    Args:
+        output_dir: Directory containing merged fonts and the manifest
+        planned: (output path, build record, job) for every variant
+        jobs: Number of worker processes passed to run_jobs()
+        force: Rebuild every variant even if it is up to date
+
+    Returns:
+        (output path, job result) of every variant that was rebuilt
+
+    Raises:
+        MergeJobsError: If any merge failed; successful merges are still recorded
+    """
+    stale = select_stale(load_manifest(output_dir), planned, force)
+    skipped = len(planned) - len(stale)
+    if not stale:
+        print(f"All {skipped} merged fonts are up to date, nothing to do")
+        return []
+
+    rebuilt = run_recorded(output_dir, stale, lambda job_list: run_jobs(job_list, jobs=jobs))
+    print(f"Rebuilt {len(stale)} merged fonts, skipped {skipped} up to date")
+    return rebuilt
+
+
+def _record_results(
+    output_dir: Path,
+    stale: Sequence[PlannedJob],
+    failed_labels: set,
+) -> None:
+    # Reload in case the other merge mode updated the manifest meanwhile
+    outputs = load_manifest(output_dir)
+    for output_path, record, job in stale:
+        if job[0] in failed_labels:
+            outputs.pop(output_path.name, None)
+        else:
+            outputs[output_path.name] = record
+    save_manifest(output_dir, outputs)
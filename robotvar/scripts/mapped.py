@@ -0,0 +1,154 @@
+"""Memory-mapped font loading for RoboTvar.
+
+TTFont normally reads a whole font file into private memory. open_font()
+can instead map the file read-only and open it lazily: tables and glyphs
+are decompiled when first used, glyf outlines are parsed from zero-copy
+views of the mapping, and CFF charstrings are read from the mapping one at
+a time when first used. The mapped pages live in the OS page cache, so
+merges of several variants running in parallel share one copy of the
+(large) emoji font instead of each holding its own.
+"""
+
+import mmap
+from fontTools.ttLib import TTFont, newTable
+from pathlib import Path
+from typing import Optional, Set, Union
+
+# Tables read as views of the mapping; other tables are parsed by code
+# that expects bytes (e.g. format 2 post names) and are read as copies.
+ZERO_COPY_TABLES = ("glyf",)
+
+# Tables parsed by cffLib straight from the mapping. TTFont would wrap the
+# table data in a BytesIO, which copies it into private memory.
+MAPPED_CFF_TABLES = ("CFF ", "CFF2")
+
+
+class MappedFontFile:
+    """Read-only file object over a memory-mapped file.
+
+    Reads starting at one of the zero_copy offsets return memoryview slices
+    of the mapping; all other reads return bytes copies.
+
+    Args:
+        path: File to map
+    """
+
+    def __init__(self, path: Path):
+        self.name = str(path)
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._pos = 0
+        self.zero_copy: Set[int] = set()
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += len(self._map)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: Optional[int] = -1) -> Union[bytes, memoryview]:
+        end = len(self._map) if size is None or size < 0 else min(len(self._map), self._pos + size)
+        if self._pos in self.zero_copy:
+            data = self._view[self._pos : end]
+        else:
+            data = self._map[self._pos : end]
+        self._pos = max(self._pos, end)
+        return data
+
+    def open_table(self, offset: int, length: int) -> "MappedTableFile":
+        """Return a file object reading length bytes of the mapping from offset."""
+        return MappedTableFile(self._map, offset, length)
+
+    def close(self) -> None:
+        """Release the mapping, or leave it to the views still referencing it."""
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Tables and glyphs still hold slices; the mapping is unmapped
+            # once the last of them is garbage collected.
+            pass
+
+
+class MappedTableFile:
+    """Read-only file object over one table of a memory-mapped font.
+
+    Offsets are relative to the start of the table, as cffLib expects.
+    Reads return bytes copies of just the requested range.
+
+    Args:
+        mapping: Mapping of the whole font file
+        offset: Offset of the table in the file
+        length: Length of the table
+    """
+
+    def __init__(self, mapping: mmap.mmap, offset: int, length: int):
+        self._map = mapping
+        self._start = offset
+        self._end = offset + length
+        self._pos = 0
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            offset += self._end - self._start
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def read(self, size: Optional[int] = -1) -> bytes:
+        start = min(self._start + self._pos, self._end)
+        end = self._end if size is None or size < 0 else min(self._end, start + size)
+        self._pos += end - start
+        return self._map[start:end]
+
+
+def _load_mapped_cff(font: TTFont, mapped: MappedFontFile, tag: str) -> None:
+    """Parse a CFF or CFF2 table from the mapping without copying it.
+
+    cffLib keeps the file object and reads every charstring and subroutine
+    when it is first used, so only those that are drawn are ever copied.
+    """
+    entry = font.reader.tables[tag]
+    table = newTable(tag)
+    table.cff.decompile(mapped.open_table(entry.offset, entry.length), font, isCFF2=tag == "CFF2")
+    font.tables[tag] = table
+
+
+def open_font(font_path: Path, use_mmap: bool = False, lazy: Optional[bool] = None) -> TTFont:
+    """Open a font, optionally memory-mapped.
+
+    Args:
+        font_path: Font file to open
+        use_mmap: Map the file instead of reading it; implies lazy loading,
+            since a non-lazy TTFont copies the whole file into memory anyway
+        lazy: TTFont lazy mode when not memory-mapping
+
+    Returns:
+        The opened font. A mapped font keeps its file mapped until closed.
+    """
+    if not use_mmap or Path(font_path).stat().st_size == 0:
+        return TTFont(font_path, lazy=lazy)
+    mapped = MappedFontFile(font_path)
+    font = TTFont(mapped, lazy=True)
+    if font.reader.flavor is not None:
+        return font  # WOFF/WOFF2 tables are compressed; read them as copies
+    mapped.zero_copy = {
+        entry.offset for tag, entry in font.reader.tables.items() if tag in ZERO_COPY_TABLES
+    }
+    for tag in MAPPED_CFF_TABLES:
+        if tag in font.reader.tables:
+            _load_mapped_cff(font, mapped, tag)
+    return font
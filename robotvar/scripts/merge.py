@@ -3,11 +3,18 @@
 Merges Roboto font variants with TossFace emoji font.
 """
 
-from fontTools.ttLib import TTFont, newTable
-from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+from fontTools.ttLib import TTFont
 from fontTools.pens.ttGlyphPen import TTGlyphPen
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from .cff_output import build_cff_outlines
+from .engine import MergeEngine, Stage, keep_emoji_units
+from .glyph_cache import DEFAULT_CACHE_DIR, GlyphCache
+from .manifest import PlannedJob, build_record, run_stale_jobs
+from .subset import codepoints_key
+from .timings import profiled_job
 
 
 def otf_to_ttf_glyph(font: TTFont, glyph_name: str) -> Optional[TTGlyphPen]:
@@ -32,97 +39,154 @@ def otf_to_ttf_glyph(font: TTFont, glyph_name: str) -> Optional[TTGlyphPen]:
     return pen.glyph()
 
 
-def merge_fonts(base_font_path: Path, emoji_font_path: Path, output_path: Path) -> None:
+def create_engine(stages: Optional[Dict[str, Stage]] = None, outline_format: str = "glyf") -> MergeEngine:
+    """Return the merge engine for TossFace.
+
+    TossFace outlines are converted from CFF unscaled, and emoji cmap entries
+    replace base font entries for the same codepoint.
+
+    Args:
+        stages: Replacement stage functions by stage name
+        outline_format: "glyf" for TrueType output, or "cff" to keep the emoji
+            charstrings and convert the base font to CFF (.otf output)
+    """
+    defaults: Dict[str, Stage] = {"scale": keep_emoji_units}
+    if outline_format == "cff":
+        defaults["convert"] = build_cff_outlines
+    stages = dict(defaults, **(stages or {}))
+    return MergeEngine(
+        lambda ctx: partial(otf_to_ttf_glyph, ctx.emoji_font),
+        emoji_cmap_wins=True,
+        stages=stages,
+    )
+
+
+def merge_fonts(
+    base_font_path: Path,
+    emoji_font_path: Path,
+    output_path: Path,
+    cache: Optional[GlyphCache] = None,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    outline_format: str = "glyf",
+    use_mmap: bool = False,
+) -> Optional[Dict[str, Any]]:
     """Merge a Roboto font variant with TossFace emoji font.
 
     Args:
         base_font_path: Path to the Roboto font variant
         emoji_font_path: Path to the TossFace emoji font
         output_path: Where to save the merged font
+        cache: Converted glyph cache, defaults to the per-process shared cache
+        cache_dir: On-disk glyph cache used by the shared cache, None to disable
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        profile: Record wall time and memory peak of every merge stage
+        outline_format: "glyf" or "cff", see create_engine()
+        use_mmap: Memory-map the input fonts and load them lazily
+
+    Returns:
+        Stage timings (see PhaseTimer.report()) if profile is set, else None
     """
-    print(f"Loading base font: {base_font_path.name}")
-    base_font = TTFont(base_font_path)
-    print(f"Loading emoji font: {emoji_font_path.name}")
-    emoji_font = TTFont(emoji_font_path)
-
-    # Get glyph sets
-    base_glyphs = set(base_font.getGlyphOrder())
-    emoji_glyphs = set(emoji_font.getGlyphOrder())
-    new_glyphs = emoji_glyphs - base_glyphs
-    print(f"Found {len(new_glyphs)} new glyphs to add")
-
-    # Copy required tables for emoji support
-    required_tables = ["GSUB", "GPOS", "GDEF", "COLR", "CPAL"]
-    for table_tag in required_tables:
-        if table_tag in emoji_font:
-            if table_tag in base_font:
-                del base_font[table_tag]
-            base_font[table_tag] = emoji_font[table_tag]
-
-    # Update glyph order
-    current_glyph_order = base_font.getGlyphOrder()
-    new_glyph_order = current_glyph_order + list(new_glyphs)
-    base_font.setGlyphOrder(new_glyph_order)
-
-    # Convert and copy new glyphs
-    print("Converting and copying glyphs...")
-    converted_count = 0
-    for glyph_name in new_glyphs:
-        ttf_glyph = otf_to_ttf_glyph(emoji_font, glyph_name)
-        if ttf_glyph:
-            base_font["glyf"][glyph_name] = ttf_glyph
-            converted_count += 1
-
-            # Copy metrics
-            if "hmtx" in emoji_font and glyph_name in emoji_font["hmtx"].metrics:
-                base_font["hmtx"][glyph_name] = emoji_font["hmtx"].metrics[glyph_name]
-
-    print(f"Successfully converted {converted_count} glyphs from OTF to TTF format")
-
-    # Update character mapping
-    new_cmap = newTable("cmap")
-    new_cmap.tableVersion = 0
-
-    format12 = CmapSubtable.newSubtable(12)
-    format12.platformID = 3
-    format12.platEncID = 10
-    format12.language = 0
-    format12.cmap = {}
-
-    # Copy base font mappings
-    for table in base_font["cmap"].tables:
-        if table.isUnicode():
-            format12.cmap.update(table.cmap)
-
-    # Add emoji font mappings
-    for table in emoji_font["cmap"].tables:
-        if table.isUnicode():
-            for code, name in table.cmap.items():
-                if name in new_glyphs:
-                    format12.cmap[code] = name
-
-    new_cmap.tables = [format12]
-    base_font["cmap"] = new_cmap
-
-    # Update maxp table
-    if "maxp" in base_font:
-        base_font["maxp"].numGlyphs = len(new_glyph_order)
-
-    # Verify consistency
-    assert len(base_font.getGlyphOrder()) == len(base_font["glyf"].glyphs)
-
-    # Save merged font
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    print(f"Saving merged font to: {output_path}")
-    base_font.save(output_path)
-    print("Font merge completed successfully!")
-
-
-def merge_all_fonts(output_dir: Optional[Path] = None) -> None:
+    return create_engine(outline_format=outline_format).merge(
+        base_font_path,
+        emoji_font_path,
+        output_path,
+        cache=cache,
+        cache_dir=cache_dir,
+        codepoints=codepoints,
+        profile=profile,
+        use_mmap=use_mmap,
+    )
+
+
+def plan_merges(
+    roboto_fonts: Sequence[Path],
+    tossface_font: Path,
+    output_dir: Path,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    cprofile_dir: Optional[Path] = None,
+    outline_format: str = "glyf",
+    use_mmap: bool = False,
+    digests: Optional[Dict[Path, str]] = None,
+) -> List[PlannedJob]:
+    """Return the merge job and build record of every Roboto variant.
+
+    Args:
+        roboto_fonts: Roboto font variants, which must already be on disk
+        tossface_font: TossFace emoji font
+        output_dir: Directory the merged fonts are written to
+        digests: Already computed file digests, reused and extended
+        (other arguments as for merge_all_fonts())
+
+    Returns:
+        (output path, build record, job) of every variant, for run_stale_jobs()
+    """
+    planned = []
+    options = {"mode": "tossface"}
+    if outline_format != "glyf":
+        options["outline_format"] = outline_format
+    suffix = ".otf" if outline_format == "cff" else ".ttf"
+    if codepoints is not None:
+        options["codepoints"] = codepoints_key(codepoints)
+    for roboto_font in roboto_fonts:
+        variant_name = roboto_font.stem  # e.g., "Roboto-Bold"
+        output_name = f"RoboTvar-{variant_name[7:]}{suffix}"  # e.g., "RoboTvar-Bold.ttf"
+        output_path = output_dir / output_name
+
+        record = build_record(
+            {"base": roboto_font, "emoji": tossface_font},
+            options,
+            digests,
+        )
+        job = profiled_job(
+            variant_name,
+            merge_fonts,
+            (roboto_font, tossface_font, output_path),
+            {
+                "cache_dir": glyph_cache_dir,
+                "codepoints": codepoints,
+                "profile": profile,
+                "outline_format": outline_format,
+                "use_mmap": use_mmap,
+            },
+            cprofile_dir,
+        )
+        planned.append((output_path, record, job))
+    return planned
+
+
+def merge_all_fonts(
+    output_dir: Optional[Path] = None,
+    jobs: int = 1,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    force: bool = False,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    cprofile_dir: Optional[Path] = None,
+    outline_format: str = "glyf",
+    use_mmap: bool = False,
+) -> List[Dict[str, Any]]:
     """Merge all Roboto font variants with TossFace emoji font.
 
+    Variants whose inputs and options match the build manifest in output_dir
+    are skipped.
+
     Args:
         output_dir: Optional custom output directory, defaults to robotvar/merged
+        jobs: Number of worker processes to merge variants with, 0 for all CPUs
+        glyph_cache_dir: On-disk converted glyph cache, None to disable it
+        force: Rebuild every variant even if it is up to date
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        profile: Record per-phase timings of every rebuilt variant
+        cprofile_dir: Dump cProfile statistics of every merge to this directory
+        outline_format: "glyf" for RoboTvar-*.ttf, or "cff" for CFF-flavored RoboTvar-*.otf
+        use_mmap: Memory-map the source fonts so parallel merges share their pages
+
+    Returns:
+        Phase timings of every rebuilt variant if profile is set, else an empty list
     """
     package_dir = Path(__file__).parent.parent
     roboto_dir = package_dir / "fonts" / "roboto"
@@ -133,7 +197,7 @@ def merge_all_fonts(output_dir: Optional[Path] = None) -> None:
     output_dir.mkdir(parents=True, exist_ok=True)
 
     # Find all Roboto variants
-    roboto_fonts = list(roboto_dir.glob("Roboto-*.ttf"))
+    roboto_fonts = sorted(roboto_dir.glob("Roboto-*.ttf"))
     if not roboto_fonts:
         raise FileNotFoundError(
             "No Roboto font variants found. Please run download first."
@@ -146,11 +210,16 @@ def merge_all_fonts(output_dir: Optional[Path] = None) -> None:
 
     print(f"Found {len(roboto_fonts)} Roboto variants to process")
 
-    # Process each Roboto variant
-    for roboto_font in roboto_fonts:
-        variant_name = roboto_font.stem  # e.g., "Roboto-Bold"
-        output_name = f"RoboTvar-{variant_name[7:]}.ttf"  # e.g., "RoboTvar-Bold.ttf"
-        output_path = output_dir / output_name
-
-        print(f"\nProcessing {variant_name}...")
-        merge_fonts(roboto_font, tossface_font, output_path)
\ No newline at end of file
+    planned = plan_merges(
+        roboto_fonts,
+        tossface_font,
+        output_dir,
+        glyph_cache_dir=glyph_cache_dir,
+        codepoints=codepoints,
+        profile=profile,
+        cprofile_dir=cprofile_dir,
+        outline_format=outline_format,
+        use_mmap=use_mmap,
+    )
+    rebuilt = run_stale_jobs(output_dir, planned, jobs=jobs, force=force)
+    return [timings for _, timings in rebuilt if timings]
\ No newline at end of file
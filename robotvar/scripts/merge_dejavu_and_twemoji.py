@@ -1,18 +1,108 @@
+import math
 import os
-from fontTools.ttLib import TTFont, newTable
-from fontTools.ttLib.tables._c_m_a_p import CmapSubtable
+from array import array
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables import ttProgram
+from fontTools.ttLib.tables._g_l_y_f import (
+    WE_HAVE_INSTRUCTIONS,
+    Glyph,
+    GlyphComponent,
+    GlyphCoordinates,
+    flagCubic,
+    flagOnCurve,
+    flagOverlapSimple,
+)
+from fontTools.pens.recordingPen import DecomposingRecordingPen
 from fontTools.pens.ttGlyphPen import TTGlyphPen
 from fontTools.pens.transformPen import TransformPen
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Set
 
-def scale_glyf_glyph(glyph_set, glyph_name, scale) -> Optional[TTGlyphPen]:
+from .engine import MergeContext, MergeEngine, Stage, copy_or_convert_glyphs
+from .glyph_cache import DEFAULT_CACHE_DIR, GlyphCache
+from .manifest import PlannedJob, build_record, run_stale_jobs
+from .subset import codepoints_key
+from .timings import profiled_job
+
+# Point flags that describe the outline; the rest is recomputed on compile
+_KEPT_POINT_FLAGS = flagOnCurve | flagCubic | flagOverlapSimple
+
+def _scale_value(value: float, scale: float) -> int:
+    return math.floor(value * scale + 0.5)  # same rounding as fontTools' otRound
+
+def scale_glyf_glyph_fast(
+    glyf_table, glyph_name: str, scale: float, x_offset: int = 0
+) -> Optional[Glyph]:
+    """Scale a glyf glyph by rescaling its flat coordinate array directly.
+
+    The coordinates are scaled and rounded in one Python pass over the
+    array instead of drawing the outline through pens; that pass measured
+    about twice as fast as GlyphCoordinates.scale() followed by toInt().
+    Simple glyphs keep their points, contours and on-curve/cubic/overlap
+    flags; hinting instructions are dropped as they no longer match the
+    outline.
+    Composites stay composites with scaled component offsets (their
+    components are scaled on their own). The source glyph is not modified.
+
+    Args:
+        glyf_table: glyf table of the emoji font
+        glyph_name: Name of the glyph to scale
+        scale: Scale factor
+        x_offset: Horizontal shift applied before scaling, as the glyph set does
+            when the hmtx left side bearing differs from xMin
+
+    Returns:
+        Scaled glyph or None if the glyph does not exist
+    """
+    if glyph_name not in glyf_table:
+        return None
+    glyph = glyf_table[glyph_name]
+    scaled = Glyph()
+    if glyph.isComposite():
+        scaled.numberOfContours = -1
+        scaled.components = []
+        for component in glyph.components:
+            new_component = GlyphComponent()
+            new_component.glyphName = component.glyphName
+            new_component.flags = component.flags & ~WE_HAVE_INSTRUCTIONS
+            if hasattr(component, "firstPt"):
+                new_component.firstPt, new_component.secondPt = component.firstPt, component.secondPt
+            else:
+                new_component.x = _scale_value(component.x + x_offset, scale)
+                new_component.y = _scale_value(component.y, scale)
+            if hasattr(component, "transform"):
+                new_component.transform = [list(row) for row in component.transform]
+            scaled.components.append(new_component)
+        return scaled
+    if glyph.numberOfContours == 0:
+        return scaled
+
+    values = glyph.coordinates.array
+    coordinates = GlyphCoordinates()
+    if x_offset:
+        scaled_values = [0] * len(values)
+        scaled_values[0::2] = [_scale_value(value + x_offset, scale) for value in values[0::2]]
+        scaled_values[1::2] = [_scale_value(value, scale) for value in values[1::2]]
+        coordinates.array.extend(scaled_values)
+    else:
+        coordinates.array.extend([_scale_value(value, scale) for value in values])
+    scaled.coordinates = coordinates
+    scaled.endPtsOfContours = list(glyph.endPtsOfContours)
+    scaled.flags = array("B", [flag & _KEPT_POINT_FLAGS for flag in glyph.flags])
+    scaled.numberOfContours = glyph.numberOfContours
+    scaled.program = ttProgram.Program()
+    scaled.program.fromBytecode(b"")
+    scaled.xMin, scaled.yMin, scaled.xMax, scaled.yMax = coordinates.calcIntBounds()
+    return scaled
+
+def decompose_glyf_glyph(glyph_set, glyph_name: str, scale: float) -> Optional[Glyph]:
+    """Draw a glyph with its components decomposed into a scaled outline."""
     if glyph_name not in glyph_set:
         return None
-    glyph = glyph_set[glyph_name]
-    pen = TTGlyphPen(glyph_set)
-    tpen = TransformPen(pen, (scale, 0, 0, scale, 0, 0))
-    glyph.draw(tpen)
+    recording = DecomposingRecordingPen(glyph_set)
+    glyph_set[glyph_name].draw(recording)
+    pen = TTGlyphPen(None)
+    recording.replay(TransformPen(pen, (scale, 0, 0, scale, 0, 0)))
     return pen.glyph()
 
 def otf_to_ttf_glyph_scaled(font: TTFont, glyph_name: str, scale: float = 1.0) -> Optional[TTGlyphPen]:
@@ -28,78 +118,177 @@ def otf_to_ttf_glyph_scaled(font: TTFont, glyph_name: str, scale: float = 1.0) -
     char_strings[glyph_name].draw(tpen)
     return pen.glyph()
 
-def merge_fonts(base_font_path: Path, emoji_font_path: Path, output_path: Path) -> None:
-    print(f"Loading base font: {base_font_path.name}")
-    base_font = TTFont(base_font_path)
-    print(f"Loading emoji font: {emoji_font_path.name}")
-    emoji_font = TTFont(emoji_font_path)
-
-    scale = base_font["head"].unitsPerEm / emoji_font["head"].unitsPerEm
-    print(f"Scaling emoji glyphs by: {scale:.3f}")
-
-    base_glyphs = set(base_font.getGlyphOrder())
-    emoji_glyphs = set(emoji_font.getGlyphOrder())
-    new_glyphs = emoji_glyphs - base_glyphs
-    print(f"Found {len(new_glyphs)} new glyphs to add")
-
-    # Copy emoji color tables if present
-    for table_tag in ["GSUB", "GPOS", "GDEF", "COLR", "CPAL"]:
-        if table_tag in emoji_font:
-            if table_tag in base_font:
-                del base_font[table_tag]
-            base_font[table_tag] = emoji_font[table_tag]
-
-    # Merge glyph order
-    new_glyph_order = base_font.getGlyphOrder() + list(new_glyphs)
-    base_font.setGlyphOrder(new_glyph_order)
-
-    print("Converting and copying emoji glyphs...")
-    converted_count = 0
-    for glyph_name in new_glyphs:
-        if "CFF " in emoji_font:
-            ttf_glyph = otf_to_ttf_glyph_scaled(emoji_font, glyph_name, scale)
+def make_converter(ctx: MergeContext):
+    """Return the scaling converter for the emoji font's outline format.
+
+    glyf sources are scaled in bulk with scale_glyf_glyph_fast(); CFF sources
+    are drawn through a TransformPen.
+    """
+    emoji_font, scale = ctx.emoji_font, ctx.scale
+    if "CFF " in emoji_font:
+        return lambda name: otf_to_ttf_glyph_scaled(emoji_font, name, scale)
+    glyf_table = emoji_font["glyf"]
+    emoji_glyph_set = emoji_font.getGlyphSet()
+    emoji_metrics = emoji_font["hmtx"].metrics
+    new_glyphs = ctx.new_glyphs
+
+    def x_offset(name):
+        # The glyph set shifts outlines whose hmtx lsb differs from xMin
+        glyph = glyf_table[name]
+        if hasattr(glyph, "xMin") and name in emoji_metrics:
+            return emoji_metrics[name][1] - glyph.xMin
+        return 0
+
+    def convert(name):
+        if name not in glyf_table:
+            return None
+        glyph = glyf_table[name]
+        if glyph.isComposite():
+            # Decompose composites whose components would resolve to base font
+            # glyphs of the same name, or whose parts are shifted differently
+            if any(
+                component.glyphName not in new_glyphs
+                or x_offset(component.glyphName) != x_offset(name)
+                for component in glyph.components
+            ):
+                return decompose_glyf_glyph(emoji_glyph_set, name, scale)
+            return scale_glyf_glyph_fast(glyf_table, name, scale)
+        return scale_glyf_glyph_fast(glyf_table, name, scale, x_offset(name))
+
+    return convert
+
+def create_engine(stages: Optional[Dict[str, Stage]] = None) -> MergeEngine:
+    """Return the merge engine for Twemoji: scaled to the base UPM, base cmap entries win.
+
+    glyf emoji that need no scaling are copied as compiled data.
+    """
+    stages = dict({"convert": copy_or_convert_glyphs}, **(stages or {}))
+    return MergeEngine(make_converter, stages=stages)
+
+def merge_fonts(
+    base_font_path: Path,
+    emoji_font_path: Path,
+    output_path: Path,
+    cache: Optional[GlyphCache] = None,
+    cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    use_mmap: bool = False,
+) -> Optional[Dict[str, Any]]:
+    return create_engine().merge(
+        base_font_path,
+        emoji_font_path,
+        output_path,
+        cache=cache,
+        cache_dir=cache_dir,
+        codepoints=codepoints,
+        profile=profile,
+        use_mmap=use_mmap,
+    )
+
+
+def plan_merges(
+    dejavu_fonts: Sequence[Path],
+    emoji_font: Path,
+    output_dir: Path,
+    showcase: bool = False,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    cprofile_dir: Optional[Path] = None,
+    use_mmap: bool = False,
+    digests: Optional[Dict[Path, str]] = None,
+) -> List[PlannedJob]:
+    """Return the merge job and build record of every DejaVuSans variant.
+
+    Args:
+        dejavu_fonts: DejaVuSans font variants, which must already be on disk
+        emoji_font: Twemoji font
+        output_dir: Directory the merged fonts are written to
+        digests: Already computed file digests, reused and extended
+        (other arguments as for merge_all_fonts())
+
+    Returns:
+        (output path, build record, job) of every variant, for run_stale_jobs()
+    """
+    # Mapping from DejaVuSans variant to RoboTvar output name
+    variant_map = {
+        "DejaVuSans.ttf": "RoboTvar-Regular.ttf",
+        "DejaVuSans-Bold.ttf": "RoboTvar-Bold.ttf",
+        "DejaVuSans-Oblique.ttf": "RoboTvar-Italic.ttf",
+        "DejaVuSans-BoldOblique.ttf": "RoboTvar-BoldItalic.ttf",
+    }
+    showcase_variant_map = {
+        "DejaVuSans.ttf": "DejaVuTwemoji-Regular.ttf",
+        "DejaVuSans-Bold.ttf": "DejaVuTwemoji-Bold.ttf",
+        "DejaVuSans-Oblique.ttf": "DejaVuTwemoji-Italic.ttf",
+        "DejaVuSans-BoldOblique.ttf": "DejaVuTwemoji-BoldItalic.ttf",
+    }
+
+    planned = []
+    options = {"mode": "twemoji"}
+    if codepoints is not None:
+        options["codepoints"] = codepoints_key(codepoints)
+    for dejavu_font in dejavu_fonts:
+        variant_name = dejavu_font.name
+        if not showcase:
+            output_name = variant_map.get(dejavu_font.name, f"RoboTvar-{dejavu_font.stem}.ttf")
         else:
-            ttf_glyph = scale_glyf_glyph(emoji_font.getGlyphSet(), glyph_name, scale)
-        if ttf_glyph:
-            base_font["glyf"][glyph_name] = ttf_glyph
-            converted_count += 1
-            if "hmtx" in emoji_font and glyph_name in emoji_font["hmtx"].metrics:
-                aw, lsb = emoji_font["hmtx"].metrics[glyph_name]
-                base_font["hmtx"][glyph_name] = (int(aw * scale), int(lsb * scale))
-    print(f"✅ Successfully added {converted_count} emoji glyphs")
-
-    # Merge character maps
-    new_cmap = newTable("cmap")
-    new_cmap.tableVersion = 0
-    format12 = CmapSubtable.newSubtable(12)
-    format12.platformID = 3
-    format12.platEncID = 10
-    format12.language = 0
-    format12.cmap = {}
-
-    for table in base_font["cmap"].tables:
-        if table.isUnicode():
-            format12.cmap.update(table.cmap)
-    for table in emoji_font["cmap"].tables:
-        if table.isUnicode():
-            for code, name in table.cmap.items():
-                if name in new_glyphs and code not in format12.cmap:
-                    format12.cmap[code] = name
-
-    new_cmap.tables = [format12]
-    base_font["cmap"] = new_cmap
-
-    if "maxp" in base_font:
-        base_font["maxp"].numGlyphs = len(new_glyph_order)
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    print(f"Saving merged font to: {output_path}")
-    base_font.save(output_path)
-    print("✅ Font merge completed!")
-
-
-def merge_all_fonts(showcase=False, output_dir: Optional[Path] = None) -> None:
-    """Merge all DejaVuSans font variants with Twemoji into RoboTvar-compatible fonts."""
+            output_name = showcase_variant_map.get(dejavu_font.name, f"DejaVuTwemoji-{dejavu_font.stem}.ttf")
+        output_path = output_dir / output_name
+
+        print(f"📦 {variant_name} -> {output_name}")
+        record = build_record(
+            {"base": dejavu_font, "emoji": emoji_font},
+            options,
+            digests,
+        )
+        job = profiled_job(
+            variant_name,
+            merge_fonts,
+            (dejavu_font, emoji_font, output_path),
+            {
+                "cache_dir": glyph_cache_dir,
+                "codepoints": codepoints,
+                "profile": profile,
+                "use_mmap": use_mmap,
+            },
+            cprofile_dir,
+        )
+        planned.append((output_path, record, job))
+    return planned
+
+
+def merge_all_fonts(
+    showcase=False,
+    output_dir: Optional[Path] = None,
+    jobs: int = 1,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    force: bool = False,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    cprofile_dir: Optional[Path] = None,
+    use_mmap: bool = False,
+) -> List[Dict[str, Any]]:
+    """Merge all DejaVuSans font variants with Twemoji into RoboTvar-compatible fonts.
+
+    Variants whose inputs and options match the build manifest in output_dir
+    are skipped.
+
+    Args:
+        showcase: Write DejaVuTwemoji-*.ttf and keep Roboto-based RoboTvar-*.ttf alongside
+        output_dir: Optional custom output directory, defaults to robotvar/merged
+        jobs: Number of worker processes to merge variants with, 0 for all CPUs
+        glyph_cache_dir: On-disk converted glyph cache, None to disable it
+        force: Rebuild every variant even if it is up to date
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        profile: Record per-phase timings of every rebuilt variant
+        cprofile_dir: Dump cProfile statistics of every merge to this directory
+        use_mmap: Memory-map the source fonts so parallel merges share their pages
+
+    Returns:
+        Phase timings of every rebuilt variant if profile is set, else an empty list
+    """
     from fontTools.ttLib import TTFont
 
     package_dir = Path(__file__).parent.parent
@@ -108,6 +297,7 @@ def merge_all_fonts(showcase=False, output_dir: Optional[Path] = None) -> None:
     output_dir = output_dir or (package_dir / "merged")
     output_dir.mkdir(parents=True, exist_ok=True)
 
+    timings = []
     # If showcase, ensure RoboTvar-*.ttf exist and are Roboto, else call merge.py's merge_all_fonts
     if showcase:
         required_variants = [
@@ -146,36 +336,33 @@ def merge_all_fonts(showcase=False, output_dir: Optional[Path] = None) -> None:
         if missing:
             print("Some RoboTvar fonts are missing for showcase mode. Generating them first...")
             from .merge import merge_all_fonts as merge_tossface_fonts
-            merge_tossface_fonts(output_dir=output_dir)
+            timings = merge_tossface_fonts(
+                output_dir=output_dir,
+                jobs=jobs,
+                glyph_cache_dir=glyph_cache_dir,
+                force=force,
+                codepoints=codepoints,
+                profile=profile,
+                cprofile_dir=cprofile_dir,
+                use_mmap=use_mmap,
+            )
 
     emoji_font = next(twemoji_dir.glob("*.ttf"))
-    dejavu_fonts = list(dejavu_dir.glob("*.ttf"))
+    dejavu_fonts = sorted(dejavu_dir.glob("*.ttf"))
     if not dejavu_fonts:
         raise FileNotFoundError("No DejaVuSans font variants found in fonts/dejavu/")
 
-    # Mapping from DejaVuSans variant to RoboTvar output name
-    variant_map = {
-        "DejaVuSans.ttf": "RoboTvar-Regular.ttf",
-        "DejaVuSans-Bold.ttf": "RoboTvar-Bold.ttf",
-        "DejaVuSans-Oblique.ttf": "RoboTvar-Italic.ttf",
-        "DejaVuSans-BoldOblique.ttf": "RoboTvar-BoldItalic.ttf",
-    }
-    showcase_variant_map = {
-        "DejaVuSans.ttf": "DejaVuTwemoji-Regular.ttf",
-        "DejaVuSans-Bold.ttf": "DejaVuTwemoji-Bold.ttf",
-        "DejaVuSans-Oblique.ttf": "DejaVuTwemoji-Italic.ttf",
-        "DejaVuSans-BoldOblique.ttf": "DejaVuTwemoji-BoldItalic.ttf",
-    }
-
     print(f"Merging {len(dejavu_fonts)} DejaVuSans variants with {emoji_font.name}")
-
-    for dejavu_font in dejavu_fonts:
-        variant_name = dejavu_font.name
-        if not showcase:
-            output_name = variant_map.get(dejavu_font.name, f"RoboTvar-{dejavu_font.stem}.ttf")
-        else:
-            output_name = showcase_variant_map.get(dejavu_font.name, f"DejaVuTwemoji-{dejavu_font.stem}.ttf")
-        output_path = output_dir / output_name
-
-        print(f"\n📦 Processing {variant_name} -> {output_name} ...")
-        merge_fonts(dejavu_font, emoji_font, output_path)
\ No newline at end of file
+    planned = plan_merges(
+        dejavu_fonts,
+        emoji_font,
+        output_dir,
+        showcase=showcase,
+        glyph_cache_dir=glyph_cache_dir,
+        codepoints=codepoints,
+        profile=profile,
+        cprofile_dir=cprofile_dir,
+        use_mmap=use_mmap,
+    )
+    rebuilt = run_stale_jobs(output_dir, planned, jobs=jobs, force=force)
+    return timings + [variant_timings for _, variant_timings in rebuilt if variant_timings]
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""Pipelined download and merge for RoboTvar.
+
+A cold build mostly waits on downloads. download_and_merge_fonts() fetches
+the fonts like download_fonts(), but submits the merge of every Roboto
+variant to a worker pool as soon as that variant and the TossFace font are
+on disk, so merges run while the remaining (unrelated) downloads are still
+in flight instead of after all of them. Hashing the inputs of a variant
+against the build manifest also happens off the download loop, on a
+planner thread. With a single job the merges run on a background thread
+of this process.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from .download import DEFAULT_MAX_CONCURRENCY, DEFAULT_MAX_CONNECTIONS, get_font_sources
+from .glyph_cache import DEFAULT_CACHE_DIR
+from .jobs import create_executor, submit_job, wait_jobs
+from .manifest import load_manifest, run_recorded, select_stale
+from .merge import plan_merges
+from .sources import get_provider
+
+EMOJI_FONT = "tossface/TossFaceFontWeb.otf"
+BASE_FONT_PREFIX = "roboto/Roboto-"
+
+
+def download_and_merge_fonts(
+    output_dir: Optional[Path] = None,
+    jobs: int = 1,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    force: bool = False,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    cprofile_dir: Optional[Path] = None,
+    outline_format: str = "glyf",
+    use_mmap: bool = False,
+    source: Optional[str] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    fonts_dir: Optional[Path] = None,
+) -> List[Dict[str, Any]]:
+    """Download every font and merge the Roboto variants with TossFace as they arrive.
+
+    Variants whose inputs and options match the build manifest are skipped,
+    as with merge.merge_all_fonts(). If a download fails, merges that were
+    already started still finish and are recorded before the error is raised.
+
+    Args:
+        output_dir: Optional custom output directory, defaults to robotvar/merged
+        jobs: Number of worker processes to merge variants with, 0 for all CPUs;
+            1 merges on a background thread of this process
+        glyph_cache_dir: On-disk converted glyph cache, None to disable it
+        force: Re-download every font and rebuild every variant
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        profile: Record per-phase timings of every rebuilt variant
+        cprofile_dir: Dump cProfile statistics of every merge to this directory
+        outline_format: "glyf" for RoboTvar-*.ttf, or "cff" for CFF-flavored RoboTvar-*.otf
+        use_mmap: Memory-map the source fonts so parallel merges share their pages
+        source: Font source, see sources.get_provider(); defaults to the upstream URLs
+        max_concurrency: Maximum number of downloads in flight at once
+        max_connections: Size of the HTTP connection pool
+        fonts_dir: Directory to download into, defaults to robotvar/fonts
+
+    Returns:
+        Phase timings of every rebuilt variant if profile is set, else an empty list
+    """
+    package_dir = Path(__file__).parent.parent
+    fonts_dir = fonts_dir or (package_dir / "fonts")
+    output_dir = output_dir or (package_dir / "merged")
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    sources = get_font_sources()
+    base_fonts = sorted(path for path in sources if path.startswith(BASE_FONT_PREFIX))
+    waiting = list(base_fonts)
+    outputs = load_manifest(output_dir)
+    executor = create_executor(jobs, len(base_fonts))
+    ready: Set[str] = set()
+    digests: Dict[Path, str] = {}
+    stale = []
+    futures = []
+    planning: List[Future] = []
+
+    def plan_arrived(arrived: List[str], in_flight: int) -> None:
+        # Runs on the planner thread: hashing the inputs would stall the downloads
+        planned = plan_merges(
+            [fonts_dir / path for path in arrived],
+            fonts_dir / EMOJI_FONT,
+            output_dir,
+            glyph_cache_dir=glyph_cache_dir,
+            codepoints=codepoints,
+            profile=profile,
+            cprofile_dir=cprofile_dir,
+            outline_format=outline_format,
+            use_mmap=use_mmap,
+            digests=digests,
+        )
+        for output_path, record, job in select_stale(outputs, planned, force):
+            if in_flight:
+                print(f"🔀 Merging {output_path.name} while {in_flight} downloads continue")
+            else:
+                print(f"🔀 Merging {output_path.name}")
+            stale.append((output_path, record, job))
+            futures.append(submit_job(executor, job))
+
+    def schedule_ready(relative_path: str) -> None:
+        # Called on the download loop; must return quickly
+        ready.add(relative_path)
+        if EMOJI_FONT not in ready:
+            return
+        arrived = [path for path in waiting if path in ready]
+        for path in arrived:
+            waiting.remove(path)
+        if arrived:
+            planning.append(planner.submit(plan_arrived, arrived, len(sources) - len(ready)))
+
+    error = None
+    with executor, ThreadPoolExecutor(max_workers=1) as planner:
+        try:
+            get_provider(
+                source,
+                max_concurrency=max_concurrency,
+                max_connections=max_connections,
+            ).fetch(fonts_dir=fonts_dir, sources=sources, force=force, on_ready=schedule_ready)
+            print("All fonts downloaded successfully!")
+        except Exception as e:
+            print(f"Error downloading fonts: {e}")
+            error = e
+        for future in planning:
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error planning merges: {e}")
+                error = error or e
+        rebuilt = []
+        if stale:
+            rebuilt = run_recorded(output_dir, stale, lambda job_list: wait_jobs(job_list, futures))
+
+    skipped = len(base_fonts) - len(waiting) - len(stale)
+    if stale:
+        print(f"Rebuilt {len(stale)} merged fonts, skipped {skipped} up to date")
+    elif skipped:
+        print(f"All {skipped} merged fonts are up to date, nothing to do")
+    if error is not None:
+        raise error
+    return [timings for _, timings in rebuilt if timings]
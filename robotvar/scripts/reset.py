@@ -20,6 +20,14 @@ def delete_all_fonts(fonts_dir: Path):
     else:
         print("Fonts directory does not exist.")
 
+def delete_cache(cache_dir: Path):
+    if cache_dir.exists() and cache_dir.is_dir():
+        print(f"Deleting cache folder: {cache_dir}")
+        shutil.rmtree(cache_dir)
+        print("Cache folder deleted.")
+    else:
+        print("Cache folder does not exist.")
+
 # Delete all files in the screenshots folder if it exists except .gitkeep
 def delete_screenshots_folder_content(screenshots_dir: Path):
     if screenshots_dir.exists() and screenshots_dir.is_dir():
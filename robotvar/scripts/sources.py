@@ -0,0 +1,357 @@
+"""Font source providers for RoboTvar.
+
+Fonts can be provisioned from the upstream GitHub URLs, from a local mirror
+directory (or file:// URL) that is hardlinked or copied into fonts/, or from
+a tar/zip bundle of such a mirror. A mirror is filled from a previous
+download with fill_mirror().
+"""
+
+import abc
+import asyncio
+import json
+import os
+import shutil
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, Optional
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+from .digest import file_digest
+from .download import (
+    CHUNK_SIZE,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_MAX_CONNECTIONS,
+    DOWNLOAD_MANIFEST_NAME,
+    download_all_fonts,
+    get_font_sources,
+    load_download_manifest,
+    save_download_manifest,
+)
+
+# Environment variable used when no --source is given on the command line
+SOURCE_ENV_VAR = "ROBOTVAR_FONT_SOURCE"
+
+BUNDLE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def _default_fonts_dir() -> Path:
+    return Path(__file__).parent.parent / "fonts"
+
+
+def _file_entry(path: Path, url: str) -> dict:
+    """Return a download manifest entry for a locally provisioned file."""
+    return {
+        "url": url,
+        "etag": None,
+        "last_modified": None,
+        "size": path.stat().st_size,
+        "sha256": file_digest(path),
+    }
+
+
+class SourceProvider(abc.ABC):
+    """Base class for font source providers."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def fetch(
+        self,
+        fonts_dir: Optional[Path] = None,
+        sources: Optional[Dict[str, str]] = None,
+        force: bool = False,
+        on_ready: Optional[Callable[[str], None]] = None,
+    ) -> Dict[str, dict]:
+        """Provision every font into fonts_dir.
+
+        Args:
+            fonts_dir: Destination directory, defaults to robotvar/fonts
+            sources: Upstream URL of every font by its path under fonts_dir
+            force: Replace files even if they are already up to date
+            on_ready: Called with the path under fonts_dir of every font as
+                soon as it is in place, while later fonts are still provisioned
+
+        Returns:
+            Download manifest entries by font path
+        """
+
+
+class HttpProvider(SourceProvider):
+    """Downloads fonts from their upstream URLs."""
+
+    name = "http"
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_connections = max_connections
+
+    def fetch(self, fonts_dir=None, sources=None, force=False, on_ready=None):
+        return asyncio.run(
+            download_all_fonts(
+                fonts_dir=fonts_dir,
+                sources=sources,
+                force=force,
+                max_concurrency=self.max_concurrency,
+                max_connections=self.max_connections,
+                on_ready=on_ready,
+            )
+        )
+
+
+class MirrorProvider(SourceProvider):
+    """Provisions fonts from a local mirror directory laid out like fonts/.
+
+    Files are hardlinked when the mirror is on the same filesystem and copied
+    otherwise. If the mirror contains a download manifest, every file is
+    checked against its recorded SHA-256 before it is used.
+    """
+
+    name = "mirror"
+
+    def __init__(self, root: Path, link: bool = True):
+        self.root = root
+        self.link = link
+
+    def fetch(self, fonts_dir=None, sources=None, force=False, on_ready=None):
+        fonts_dir = fonts_dir or _default_fonts_dir()
+        sources = sources if sources is not None else get_font_sources()
+        if not self.root.is_dir():
+            raise FileNotFoundError(f"Font mirror not found: {self.root}")
+
+        mirror_manifest = load_download_manifest(self.root)
+        manifest = {} if force else load_download_manifest(fonts_dir)
+        provisioned = 0
+        for relative_path in sources:
+            src = self.root / relative_path
+            dest = fonts_dir / relative_path
+            if not src.is_file():
+                raise FileNotFoundError(f"{relative_path} is missing from mirror {self.root}")
+            url = src.resolve().as_uri()
+            if not force and _same_file(src, dest):
+                print(f"✅ Up to date: {dest.name}")
+            else:
+                expected = mirror_manifest.get(relative_path, {}).get("sha256")
+                if expected and file_digest(src) != expected:
+                    raise ValueError(f"Checksum mismatch for {relative_path} in mirror {self.root}")
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                how = _link_or_copy(src, dest, self.link)
+                print(f"✅ {how}: {dest.name}")
+                provisioned += 1
+            manifest[relative_path] = _file_entry(dest, url)
+            if on_ready is not None:
+                on_ready(relative_path)
+
+        save_download_manifest(fonts_dir, manifest)
+        print(
+            f"Provisioned {provisioned} fonts from {self.root}, "
+            f"{len(sources) - provisioned} already up to date"
+        )
+        return manifest
+
+
+class BundleProvider(SourceProvider):
+    """Provisions fonts from a .zip or .tar(.gz/.bz2/.xz) bundle of a mirror.
+
+    Members are matched by their path under fonts/, optionally below one
+    top-level directory (e.g. "robotvar-fonts/roboto/Roboto-Bold.ttf").
+    """
+
+    name = "bundle"
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def fetch(self, fonts_dir=None, sources=None, force=False, on_ready=None):
+        fonts_dir = fonts_dir or _default_fonts_dir()
+        sources = sources if sources is not None else get_font_sources()
+        if not self.path.is_file():
+            raise FileNotFoundError(f"Font bundle not found: {self.path}")
+
+        url = self.path.resolve().as_uri()
+        manifest = {} if force else load_download_manifest(fonts_dir)
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                members = {name: name for name in archive.namelist() if not name.endswith("/")}
+                opener = archive.open
+                extracted = self._extract(
+                    members, opener, fonts_dir, sources, manifest, url, force, on_ready
+                )
+        else:
+            with tarfile.open(self.path, "r:*") as archive:
+                members = {member.name: member for member in archive.getmembers() if member.isfile()}
+                opener = archive.extractfile
+                extracted = self._extract(
+                    members, opener, fonts_dir, sources, manifest, url, force, on_ready
+                )
+
+        save_download_manifest(fonts_dir, manifest)
+        print(
+            f"Extracted {extracted} fonts from {self.path.name}, "
+            f"{len(sources) - extracted} already up to date"
+        )
+        return manifest
+
+    def _extract(self, members, opener, fonts_dir, sources, manifest, url, force, on_ready) -> int:
+        bundle_manifest = {}
+        manifest_member = _find_member(members, DOWNLOAD_MANIFEST_NAME)
+        if manifest_member is not None:
+            with opener(members[manifest_member]) as f:
+                bundle_manifest = json.load(f).get("files", {})
+
+        extracted = 0
+        for relative_path in sources:
+            member_name = _find_member(members, relative_path)
+            if member_name is None:
+                raise FileNotFoundError(f"{relative_path} is missing from bundle {self.path}")
+            dest = fonts_dir / relative_path
+            expected = bundle_manifest.get(relative_path, {}).get("sha256")
+            entry = manifest.get(relative_path)
+            if (
+                not force
+                and expected
+                and entry
+                and entry.get("sha256") == expected
+                and dest.is_file()
+                and file_digest(dest) == expected
+            ):
+                print(f"✅ Up to date: {dest.name}")
+                manifest[relative_path] = dict(entry, url=f"{url}#{member_name}")
+                if on_ready is not None:
+                    on_ready(relative_path)
+                continue
+
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            part_path = dest.with_name(dest.name + ".part")
+            try:
+                with opener(members[member_name]) as src, open(part_path, "wb") as out:
+                    shutil.copyfileobj(src, out, CHUNK_SIZE)
+                if expected and file_digest(part_path) != expected:
+                    raise ValueError(f"Checksum mismatch for {relative_path} in bundle {self.path}")
+                os.replace(part_path, dest)
+            finally:
+                part_path.unlink(missing_ok=True)
+            print(f"✅ Extracted: {dest.name}")
+            extracted += 1
+            manifest[relative_path] = _file_entry(dest, f"{url}#{member_name}")
+            if on_ready is not None:
+                on_ready(relative_path)
+        return extracted
+
+
+def _find_member(members: Dict[str, object], relative_path: str) -> Optional[str]:
+    """Return the archive member for relative_path, at the root or one directory deep."""
+    if relative_path in members:
+        return relative_path
+    for name in members:
+        _, sep, rest = name.lstrip("./").partition("/")
+        if sep and rest == relative_path:
+            return name
+    return None
+
+
+def _same_file(src: Path, dest: Path) -> bool:
+    """Return True if dest already holds the contents of src."""
+    if not dest.is_file():
+        return False
+    try:
+        if os.path.samefile(src, dest):
+            return True
+    except OSError:
+        return False
+    return src.stat().st_size == dest.stat().st_size and file_digest(src) == file_digest(dest)
+
+
+def _link_or_copy(src: Path, dest: Path, link: bool) -> str:
+    """Hardlink src to dest, falling back to a copy; returns what was done."""
+    part_path = dest.with_name(dest.name + ".part")
+    part_path.unlink(missing_ok=True)
+    try:
+        if link:
+            try:
+                os.link(src, part_path)
+                os.replace(part_path, dest)
+                return "Linked"
+            except OSError:
+                part_path.unlink(missing_ok=True)
+        shutil.copy2(src, part_path)
+        os.replace(part_path, dest)
+        return "Copied"
+    finally:
+        part_path.unlink(missing_ok=True)
+
+
+def get_provider(
+    spec: Optional[str] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+) -> SourceProvider:
+    """Return the provider for a source specification.
+
+    Args:
+        spec: "http" (default), a file:// URL or directory path of a mirror, or
+            the path of a .zip/.tar bundle. Falls back to the
+            ROBOTVAR_FONT_SOURCE environment variable when None.
+        max_concurrency: Maximum number of downloads in flight (HTTP only)
+        max_connections: Size of the HTTP connection pool (HTTP only)
+
+    Returns:
+        Source provider instance
+    """
+    spec = spec or os.environ.get(SOURCE_ENV_VAR) or "http"
+    if spec in ("http", "https"):
+        return HttpProvider(max_concurrency=max_concurrency, max_connections=max_connections)
+
+    if spec.startswith("file://"):
+        path = Path(url2pathname(unquote(urlparse(spec).path)))
+    else:
+        path = Path(spec).expanduser()
+
+    if path.name.lower().endswith(BUNDLE_SUFFIXES):
+        return BundleProvider(path)
+    return MirrorProvider(path)
+
+
+def fill_mirror(mirror_dir: Path, fonts_dir: Optional[Path] = None, link: bool = True) -> None:
+    """Fill a mirror directory from a previous download.
+
+    Copies (or hardlinks) every required font and the download manifest from
+    fonts_dir into mirror_dir, laid out so MirrorProvider can use it directly.
+
+    Args:
+        mirror_dir: Mirror directory to fill, created if missing
+        fonts_dir: Directory with downloaded fonts, defaults to robotvar/fonts
+        link: Hardlink files when possible instead of copying them
+    """
+    fonts_dir = fonts_dir or _default_fonts_dir()
+    sources = get_font_sources()
+    missing = [path for path in sources if not (fonts_dir / path).is_file()]
+    if missing:
+        raise FileNotFoundError(
+            f"Cannot fill mirror, fonts missing from {fonts_dir}: {', '.join(missing)}. "
+            "Please run download first."
+        )
+
+    manifest = load_download_manifest(fonts_dir)
+    mirror_manifest = {}
+    for relative_path in sources:
+        src = fonts_dir / relative_path
+        dest = mirror_dir / relative_path
+        entry = manifest.get(relative_path)
+        if not entry or not entry.get("sha256"):
+            entry = _file_entry(src, sources[relative_path])
+        mirror_manifest[relative_path] = entry
+        if _same_file(src, dest):
+            print(f"✅ Up to date: {relative_path}")
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        how = _link_or_copy(src, dest, link)
+        print(f"✅ {how}: {relative_path}")
+
+    save_download_manifest(mirror_dir, mirror_manifest)
+    print(f"Mirror filled: {mirror_dir}")
@@ -0,0 +1,117 @@
+"""Codepoint-driven emoji subsetting for RoboTvar.
+
+Reduces the emoji font to the requested codepoints and their GSUB closure
+(ZWJ sequences, skin tone and flag ligatures, COLR layers) before its
+glyphs are converted and merged.
+"""
+
+import hashlib
+from fontTools import subset
+from fontTools.ttLib import TTFont
+from pathlib import Path
+from typing import Iterable, Optional, Set
+
+
+def parse_codepoints(spec: str) -> Set[int]:
+    """Parse a codepoint specification.
+
+    Accepts comma or whitespace separated codepoints and ranges written as
+    hex with an optional "U+"/"0x" prefix, e.g. "U+1F600-U+1F64F, 1F44B, 2764".
+
+    Args:
+        spec: Codepoint specification
+
+    Returns:
+        Set of codepoints
+
+    Raises:
+        ValueError: If an item is not a valid codepoint or range
+    """
+    codepoints = set()
+    for item in spec.replace(",", " ").split():
+        start, _, end = item.partition("-")
+        first = _parse_codepoint(start)
+        last = _parse_codepoint(end) if end else first
+        if last < first:
+            raise ValueError(f"Invalid codepoint range: {item}")
+        codepoints.update(range(first, last + 1))
+    return codepoints
+
+
+def _parse_codepoint(text: str) -> int:
+    text = text.strip().upper()
+    for prefix in ("U+", "0X"):
+        if text.startswith(prefix):
+            text = text[len(prefix):]
+    try:
+        codepoint = int(text, 16)
+    except ValueError:
+        raise ValueError(f"Invalid codepoint: {text!r}") from None
+    if not 0 <= codepoint <= 0x10FFFF:
+        raise ValueError(f"Codepoint out of range: {text!r}")
+    return codepoint
+
+
+def read_text_codepoints(text_file: Path) -> Set[int]:
+    """Return every codepoint used in a UTF-8 text file."""
+    return {ord(char) for char in text_file.read_text(encoding="utf-8")}
+
+
+def collect_codepoints(
+    codepoints: Optional[str] = None, text_file: Optional[Path] = None
+) -> Optional[Set[int]]:
+    """Combine --codepoints and --text-file into one set.
+
+    Returns:
+        Set of codepoints, or None if neither option was given (no subsetting)
+
+    Raises:
+        ValueError: If the options select no codepoints at all, which would
+            subset every emoji away
+    """
+    if codepoints is None and text_file is None:
+        return None
+    result = set()
+    if codepoints is not None:
+        result |= parse_codepoints(codepoints)
+    if text_file is not None:
+        result |= read_text_codepoints(text_file)
+    if not result:
+        raise ValueError("--codepoints/--text-file select no codepoints")
+    return result
+
+
+def codepoints_key(codepoints: Optional[Iterable[int]]) -> Optional[str]:
+    """Return a short stable digest of a codepoint set, None if not subsetting."""
+    if codepoints is None:
+        return None
+    text = ",".join(f"{codepoint:X}" for codepoint in sorted(set(codepoints)))
+    return hashlib.sha256(text.encode("ascii")).hexdigest()[:16]
+
+
+def subset_emoji_font(font: TTFont, codepoints: Iterable[int]) -> TTFont:
+    """Subset an emoji font in place to codepoints and their layout closure.
+
+    Glyph names are kept, so converted glyphs cached for the full font stay
+    valid for the subset.
+
+    Args:
+        font: Emoji font to subset
+        codepoints: Codepoints to keep
+
+    Returns:
+        The same font object, subset
+    """
+    options = subset.Options()
+    options.glyph_names = True
+    options.layout_features = ["*"]
+    options.layout_closure = True
+    options.name_IDs = ["*"]
+    options.name_languages = ["*"]
+    options.notdef_outline = True
+    options.prune_unicode_ranges = False
+    options.passthrough_tables = True
+    subsetter = subset.Subsetter(options=options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    return font
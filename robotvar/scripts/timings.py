@@ -0,0 +1,182 @@
+"""Per-phase timing and memory instrumentation for RoboTvar merges.
+
+merge_fonts() wraps each of its phases in PhaseTimer.phase(). With
+--profile the wall time and tracemalloc peak of every phase, and the peak
+resident set size of the whole merge, are recorded and returned from the
+worker, and merge reports are written as JSON for CI dashboards.
+profile_call() dumps cProfile statistics of a whole merge for deeper dives.
+"""
+
+import cProfile
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from fontTools import version as fonttools_version
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from .. import __version__
+from .jobs import Job
+
+TIMINGS_VERSION = 1
+
+
+def reset_peak_rss() -> None:
+    """Reset the peak resident set size of this process, where the OS allows it.
+
+    Only Linux supports this (via /proc/self/clear_refs); elsewhere the peak
+    keeps covering the whole lifetime of the process.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """Return the peak resident set size of this process in bytes, None if unknown.
+
+    Includes file-backed pages, e.g. of memory-mapped fonts, which are
+    shared with other processes mapping the same file.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KiB elsewhere
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class PhaseTimer:
+    """Records the wall time and traced memory peak of named phases.
+
+    Args:
+        label: Name of what is being timed, e.g. the output font
+        enabled: Record phases; when False phase() does nothing
+        trace_memory: Record the tracemalloc peak of each phase (slower)
+    """
+
+    def __init__(self, label: str, enabled: bool = True, trace_memory: bool = True):
+        self.label = label
+        self.enabled = enabled
+        self.trace_memory = enabled and trace_memory
+        self.phases: List[Dict[str, Any]] = []
+        self._started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if enabled:
+            reset_peak_rss()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the enclosed block as phase name."""
+        if not self.enabled:
+            yield
+            return
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            entry = {"name": name, "seconds": time.perf_counter() - start}
+            if self.trace_memory:
+                entry["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            self.phases.append(entry)
+
+    def report(self) -> Dict[str, Any]:
+        """Stop memory tracing (if started here) and return the recorded phases."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        report = {
+            "label": self.label,
+            "pid": os.getpid(),
+            "seconds": sum(phase["seconds"] for phase in self.phases),
+            "phases": self.phases,
+        }
+        if self.trace_memory:
+            report["peak_bytes"] = max((phase["peak_bytes"] for phase in self.phases), default=0)
+        if self.enabled:
+            report["peak_rss_bytes"] = peak_rss_bytes()
+        return report
+
+
+def profile_call(prof_path: Path, func: Callable, *args, **kwargs) -> Any:
+    """Call func under cProfile and dump the statistics to prof_path.
+
+    Inspect the dump with e.g. ``python -m pstats prof_path`` or snakeviz.
+    """
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        prof_path.parent.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(str(prof_path))
+        print(f"📈 cProfile statistics saved to {prof_path}")
+
+
+def profiled_job(
+    label: str,
+    func: Callable,
+    args: tuple,
+    kwargs: dict,
+    cprofile_dir: Optional[Path] = None,
+) -> Job:
+    """Return a run_jobs() job, wrapped in profile_call() when cprofile_dir is set.
+
+    The statistics of each job are dumped to cprofile_dir/<label>.prof.
+    """
+    if cprofile_dir is None:
+        return (label, func, args, kwargs)
+    return (label, profile_call, (cprofile_dir / f"{label}.prof", func) + tuple(args), kwargs)
+
+
+def print_timings(reports: List[Dict[str, Any]]) -> None:
+    """Print a per-phase table of every merge report."""
+    for report in reports:
+        line = f"\n⏱️  {report['label']}: {report['seconds'] * 1000:.1f} ms"
+        if report.get("peak_rss_bytes"):
+            line += f", {report['peak_rss_bytes'] / (1024 * 1024):.1f} MiB peak RSS"
+        print(line)
+        for phase in report["phases"]:
+            line = f"  {phase['name']:<12} {phase['seconds'] * 1000:>10.1f} ms"
+            if "peak_bytes" in phase:
+                line += f" {phase['peak_bytes'] / (1024 * 1024):>9.1f} MiB peak"
+            print(line)
+
+
+def write_timings_json(output_path: Path, reports: List[Dict[str, Any]], mode: Optional[str] = None) -> None:
+    """Write merge reports as a JSON document.
+
+    Args:
+        output_path: JSON file to write
+        reports: Reports returned by PhaseTimer.report(), one per merged font
+        mode: Merge mode the reports belong to, e.g. "tossface" or "twemoji"
+    """
+    document = {
+        "version": TIMINGS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "mode": mode,
+        "robotvar": __version__,
+        "fonttools": fonttools_version,
+        "python": platform.python_version(),
+        "merges": reports,
+    }
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps(document, indent=2) + "\n", encoding="utf-8")
+    print(f"Timings saved to {output_path}")
@@ -0,0 +1,362 @@
+"""Watch mode for RoboTvar.
+
+watch_fonts() rebuilds the merged fonts whenever a source font under
+robotvar/fonts changes. Merges run in the watching process, so parsed
+emoji fonts, converted glyphs and converted base charstrings stay in
+memory between rebuilds. Only variants whose inputs changed (according to
+the build manifest) are merged again, and when the emoji font changes the
+glyphs whose outlines did not change keep their converted versions.
+Changes are picked up with inotify on Linux and by polling elsewhere.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from fontTools.ttLib import TTFont
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .cff_output import retain_base_programs
+from .coverage_matrix import FONT_SUFFIXES
+from .glyph_cache import DEFAULT_CACHE_DIR, shared_cache
+from .jobs import MergeJobsError, run_jobs
+from .manifest import PlannedJob, load_manifest, run_recorded, select_stale
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+# struct inotify_event header: wd, mask, cookie, len (followed by the name)
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+POLL_INTERVAL = 1.0  # seconds between scans of the polling watcher
+DEBOUNCE_SECONDS = 0.3  # quiet time after the last change before rebuilding
+
+
+class PollingWatcher:
+    """Detects changed font files by comparing their size and modification time.
+
+    Args:
+        dirs: Directories whose font files are watched (not recursive)
+        interval: Seconds between scans
+    """
+
+    def __init__(self, dirs: Iterable[Path], interval: float = POLL_INTERVAL):
+        self.dirs = list(dirs)
+        self.interval = interval
+        self._state = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        state = {}
+        for directory in self.dirs:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.lower().endswith(FONT_SUFFIXES):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                state[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+        return state
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Return the files changed since the last call, waiting up to timeout seconds.
+
+        Waits until something changes if timeout is None.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._snapshot()
+            changed = {
+                path for path in set(state) | set(self._state) if state.get(path) != self._state.get(path)
+            }
+            self._state = state
+            if changed:
+                return changed
+            delay = self.interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return set()
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Detects changed files with Linux inotify, called through ctypes.
+
+    Args:
+        dirs: Directories whose files are watched (not recursive)
+
+    Raises:
+        OSError: If inotify is not available or a directory cannot be watched
+    """
+
+    def __init__(self, dirs: Iterable[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._dirs: Dict[int, Path] = {}
+        for directory in dirs:
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                errno = ctypes.get_errno()
+                self.close()
+                raise OSError(errno, os.strerror(errno), str(directory))
+            self._dirs[wd] = Path(directory)
+
+    def wait(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Return the files changed since the last call, waiting up to timeout seconds.
+
+        Waits until something changes if timeout is None.
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        changed: Set[Path] = set()
+        if not readable:
+            return changed
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+                offset += _INOTIFY_EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if name and wd in self._dirs:
+                    changed.add(self._dirs[wd] / os.fsdecode(name))
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(dirs: Iterable[Path], poll: bool = False):
+    """Return an InotifyWatcher, or a PollingWatcher if poll is set or inotify is unavailable."""
+    dirs = list(dirs)
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(dirs)
+        except OSError as e:
+            print(f"⚠️  inotify unavailable ({e}), polling for changes instead")
+    return PollingWatcher(dirs)
+
+
+def wait_for_changes(watcher, debounce: float = DEBOUNCE_SECONDS) -> Set[Path]:
+    """Block until font files change, then until they stay unchanged for debounce seconds.
+
+    Editors and downloads often write a file in several steps; waiting for a
+    quiet period rebuilds once per save instead of once per write.
+    """
+
+    def fonts(paths: Set[Path]) -> Set[Path]:
+        return {path for path in paths if path.suffix.lower() in FONT_SUFFIXES}
+
+    changed: Set[Path] = set()
+    while not changed:
+        changed = fonts(watcher.wait())
+    while True:
+        more = fonts(watcher.wait(debounce))
+        if not more:
+            return changed
+        changed |= more
+
+
+def _charstring_bytes(charstring) -> bytes:
+    if charstring.bytecode is None:
+        charstring.compile()
+    return charstring.bytecode
+
+
+def _subrs_bytes(subrs) -> list:
+    return [_charstring_bytes(subrs[i]) for i in range(len(subrs))]
+
+
+def unchanged_glyphs(old_font: TTFont, new_font: TTFont) -> Set[str]:
+    """Return the glyphs whose outlines are the same in two versions of an emoji font.
+
+    Glyphs are compared by their compiled glyf data or CFF charstrings, so only
+    fonts with the same glyph order (and, for CFF, the same subroutines) can
+    share glyphs; otherwise the set is empty.
+    """
+    glyph_order = old_font.getGlyphOrder()
+    if glyph_order != new_font.getGlyphOrder():
+        return set()
+
+    if "glyf" in old_font and "glyf" in new_font:
+        old_glyf, new_glyf = old_font["glyf"], new_font["glyf"]
+
+        def glyph_data(glyf, glyph_name):
+            glyph = glyf.glyphs[glyph_name]
+            return glyph.data if hasattr(glyph, "data") else glyph.compile(glyf, recalcBBoxes=False)
+
+        changed = {
+            glyph_name
+            for glyph_name in glyph_order
+            if glyph_data(old_glyf, glyph_name) != glyph_data(new_glyf, glyph_name)
+        }
+        # A composite drawn from a changed component changed as well
+        components = {
+            glyph_name: set(glyph.getComponentNames(new_glyf))
+            for glyph_name, glyph in new_glyf.glyphs.items()
+            if glyph.isComposite()
+        }
+        grew = True
+        while grew:
+            grew = False
+            for glyph_name, names in components.items():
+                if glyph_name not in changed and names & changed:
+                    changed.add(glyph_name)
+                    grew = True
+        return set(glyph_order) - changed
+
+    if "CFF " in old_font and "CFF " in new_font:
+        old_cff, new_cff = old_font["CFF "].cff, new_font["CFF "].cff
+        old_top, new_top = old_cff[old_cff.fontNames[0]], new_cff[new_cff.fontNames[0]]
+        if hasattr(old_top, "FDArray") or hasattr(new_top, "FDArray"):
+            return set()
+        if _subrs_bytes(old_cff.GlobalSubrs) != _subrs_bytes(new_cff.GlobalSubrs):
+            return set()
+        old_subrs = getattr(old_top.Private, "Subrs", [])
+        new_subrs = getattr(new_top.Private, "Subrs", [])
+        if _subrs_bytes(old_subrs) != _subrs_bytes(new_subrs):
+            return set()
+        return {
+            glyph_name
+            for glyph_name in glyph_order
+            if _charstring_bytes(old_top.CharStrings[glyph_name])
+            == _charstring_bytes(new_top.CharStrings[glyph_name])
+        }
+    return set()
+
+
+def watch_fonts(
+    merge_twemoji: bool = False,
+    showcase: bool = False,
+    output_dir: Optional[Path] = None,
+    glyph_cache_dir: Optional[Path] = DEFAULT_CACHE_DIR,
+    codepoints: Optional[Set[int]] = None,
+    profile: bool = False,
+    outline_format: str = "glyf",
+    poll: bool = False,
+    fonts_dir: Optional[Path] = None,
+) -> None:
+    """Build the merged fonts, then rebuild them whenever a source font changes.
+
+    Runs until interrupted with Ctrl+C. Source fonts are read into memory
+    rather than memory-mapped, since they may be rewritten while watched.
+
+    Args:
+        merge_twemoji: Watch the DejaVuSans + Twemoji merge instead of Roboto + TossFace
+        showcase: With merge_twemoji, write DejaVuTwemoji-*.ttf
+        output_dir: Optional custom output directory, defaults to robotvar/merged
+        glyph_cache_dir: On-disk converted glyph cache, None to disable it
+        codepoints: Only merge emoji for these codepoints and their GSUB closure
+        profile: Print per-phase timings of every rebuilt variant
+        outline_format: "glyf" or "cff" for the TossFace merge
+        poll: Poll for changes instead of using inotify (e.g. on network mounts)
+        fonts_dir: Directory with the source fonts, defaults to robotvar/fonts
+    """
+    package_dir = Path(__file__).parent.parent
+    fonts_dir = fonts_dir or (package_dir / "fonts")
+    output_dir = output_dir or (package_dir / "merged")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = shared_cache(glyph_cache_dir)
+    emoji_digests: Dict[Path, str] = {}
+
+    def plan() -> Tuple[Path, List[PlannedJob]]:
+        if merge_twemoji:
+            from .merge_dejavu_and_twemoji import plan_merges
+
+            emoji_font = next((fonts_dir / "twemoji").glob("*.ttf"), None)
+            base_fonts = sorted((fonts_dir / "dejavu").glob("*.ttf"))
+            options = {"showcase": showcase}
+        else:
+            from .merge import plan_merges
+
+            emoji_font = next((fonts_dir / "tossface").glob("*.otf"), None)
+            base_fonts = sorted((fonts_dir / "roboto").glob("Roboto-*.ttf"))
+            options = {"outline_format": outline_format}
+        if emoji_font is None or not base_fonts:
+            raise FileNotFoundError(f"Source fonts missing from {fonts_dir}. Please run download first.")
+        planned = plan_merges(
+            base_fonts,
+            emoji_font,
+            output_dir,
+            glyph_cache_dir=glyph_cache_dir,
+            codepoints=codepoints,
+            profile=profile,
+            digests={},
+            **options,
+        )
+        return emoji_font, planned
+
+    def reuse_glyphs(emoji_font: Path, planned: List[PlannedJob]) -> None:
+        """Carry converted glyphs over to a changed emoji font and drop stale fonts."""
+        digest = planned[0][1]["inputs"]["emoji"]["sha256"]
+        old_digest = emoji_digests.get(emoji_font)
+        emoji_digests[emoji_font] = digest
+        if old_digest and old_digest != digest and old_digest in cache.fonts:
+            old_font = cache.fonts[old_digest]
+            new_font, _ = cache.load_font(emoji_font)
+            carried = cache.carry_over(old_digest, digest, unchanged_glyphs(old_font, new_font))
+            print(f"♻️  Kept {carried} converted glyphs unchanged in {emoji_font.name}")
+        cache.retain_fonts(set(emoji_digests.values()))
+        retain_base_programs({record["inputs"]["base"]["sha256"] for _, record, _ in planned})
+
+    def rebuild() -> None:
+        started = time.perf_counter()
+        emoji_font, planned = plan()
+        reuse_glyphs(emoji_font, planned)
+        stale = select_stale(load_manifest(output_dir), planned)
+        if not stale:
+            print("Nothing to rebuild, every merged font is up to date")
+            return
+        try:
+            rebuilt = run_recorded(output_dir, stale, lambda job_list: run_jobs(job_list, jobs=1))
+        except MergeJobsError as e:
+            print(f"❌ Rebuild failed ({e}), waiting for the next change")
+            return
+        names = ", ".join(output_path.name for output_path, _ in rebuilt)
+        print(f"🔁 Rebuilt {names} in {time.perf_counter() - started:.2f} s")
+        if profile:
+            from .timings import print_timings
+
+            print_timings([timings for _, timings in rebuilt if timings])
+
+    rebuild()
+    watcher = create_watcher((path for path in sorted(fonts_dir.iterdir()) if path.is_dir()), poll=poll)
+    try:
+        while True:
+            print(f"👀 Watching {fonts_dir} for changes (Ctrl+C to stop)")
+            changed = wait_for_changes(watcher)
+            print(f"\n✏️  Changed: {', '.join(sorted(path.name for path in changed))}")
+            try:
+                rebuild()
+            except Exception as e:
+                print(f"❌ Rebuild failed: {e}")
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
@@ -0,0 +1,164 @@
+"""WOFF/WOFF2 web font output for RoboTvar.
+
+Writes compressed copies of the merged fonts for web and mobile clients:
+WOFF (zlib) always, WOFF2 (Brotli) when the optional brotli package is
+installed. Fonts are compressed in parallel worker processes, and a report
+compares the size of every format.
+"""
+
+import sys
+from fontTools.ttLib import TTFont
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, TextIO
+
+from .coverage_matrix import FONT_SUFFIXES
+from .jobs import run_jobs
+
+WEB_FLAVORS = ("woff", "woff2")
+
+
+def brotli_available() -> bool:
+    """Return whether the optional brotli package needed for WOFF2 is installed."""
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def available_flavors() -> List[str]:
+    """Return the web font flavors that can be written in this environment."""
+    return [flavor for flavor in WEB_FLAVORS if flavor != "woff2" or brotli_available()]
+
+
+def web_font_path(font_path: Path, flavor: str) -> Path:
+    """Return the web font path of a merged font.
+
+    RoboTvar-Regular.ttf becomes RoboTvar-Regular.woff. CFF-flavored .otf
+    fonts keep their suffix (RoboTvar-Regular.otf.woff), so they never share
+    a web font with the TrueType font of the same name.
+    """
+    if font_path.suffix.lower() == ".otf":
+        return font_path.with_name(f"{font_path.name}.{flavor}")
+    return font_path.with_suffix(f".{flavor}")
+
+
+def _size_record(font_path: Path, flavor: str) -> Dict[str, Any]:
+    output_path = web_font_path(font_path, flavor)
+    return {
+        "font": str(font_path),
+        "flavor": flavor,
+        "path": str(output_path),
+        "source_bytes": font_path.stat().st_size,
+        "bytes": output_path.stat().st_size,
+    }
+
+
+def compress_font(font_path: Path, flavor: str) -> Dict[str, Any]:
+    """Write font_path as a WOFF or WOFF2 file next to it, see web_font_path().
+
+    Tables are copied from the source without decompiling them, except
+    where WOFF2 transforms glyf and loca.
+
+    Args:
+        font_path: Merged .ttf or .otf font
+        flavor: "woff" or "woff2"
+
+    Returns:
+        Dict with the source path, the web font path and both sizes in bytes
+    """
+    output_path = web_font_path(font_path, flavor)
+    font = TTFont(font_path, lazy=True)
+    try:
+        font.flavor = flavor
+        font.save(output_path, reorderTables=False)
+    finally:
+        font.close()
+    return _size_record(font_path, flavor)
+
+
+def find_merged_fonts(output_dir: Path) -> List[Path]:
+    """Return every merged .ttf/.otf font in output_dir."""
+    return sorted(p for p in output_dir.iterdir() if p.suffix.lower() in FONT_SUFFIXES)
+
+
+def write_web_fonts(
+    fonts: Sequence[Path],
+    flavors: Optional[Sequence[str]] = None,
+    jobs: Optional[int] = 1,
+    force: bool = False,
+) -> List[Dict[str, Any]]:
+    """Compress fonts to web font flavors, in parallel across fonts and flavors.
+
+    Web fonts newer than their source font are kept unless force is set.
+
+    Args:
+        fonts: Merged fonts to compress
+        flavors: Flavors to write, defaults to available_flavors()
+        jobs: Number of worker processes, 0 for one per CPU
+        force: Rewrite web fonts even if they are up to date
+
+    Returns:
+        One compress_font() result per font and flavor, in the order of fonts
+    """
+    if flavors is None:
+        flavors = available_flavors()
+        if "woff2" not in flavors:
+            print("⚠️  brotli is not installed, skipping WOFF2 (pip install brotli)")
+    elif "woff2" in flavors and not brotli_available():
+        raise RuntimeError("WOFF2 output needs the brotli package (pip install brotli)")
+
+    job_list = []
+    results = []
+    for font_path in fonts:
+        for flavor in flavors:
+            output_path = web_font_path(font_path, flavor)
+            if (
+                not force
+                and output_path.exists()
+                and output_path.stat().st_mtime_ns >= font_path.stat().st_mtime_ns
+            ):
+                results.append(_size_record(font_path, flavor))
+                continue
+            job_list.append((output_path.name, compress_font, (font_path, flavor), {}))
+
+    if job_list:
+        print(f"🗜️  Compressing {len(job_list)} web fonts")
+    results.extend(run_jobs(job_list, jobs=jobs))
+    order = {str(font_path): i for i, font_path in enumerate(fonts)}
+    results.sort(key=lambda result: (order[result["font"]], WEB_FLAVORS.index(result["flavor"])))
+    return results
+
+
+def print_size_report(results: Sequence[Dict[str, Any]], out: Optional[TextIO] = None) -> None:
+    """Print the size of every merged font and its web font flavors.
+
+    Args:
+        results: Results returned by write_web_fonts()
+        out: Stream to write to, defaults to stdout
+    """
+    out = out or sys.stdout
+    by_font: Dict[str, Dict[str, Any]] = {}
+    for result in results:
+        entry = by_font.setdefault(result["font"], {"source_bytes": result["source_bytes"]})
+        entry[result["flavor"]] = result["bytes"]
+
+    flavors = [flavor for flavor in WEB_FLAVORS if any(flavor in entry for entry in by_font.values())]
+    out.write(f"\n{'font':<32} {'sfnt':>10}" + "".join(f" {flavor:>18}" for flavor in flavors) + "\n")
+    totals = {"source_bytes": 0, **{flavor: 0 for flavor in flavors}}
+    for font, entry in by_font.items():
+        line = f"{Path(font).name:<32} {entry['source_bytes'] / 1024:>7.1f} KiB"
+        totals["source_bytes"] += entry["source_bytes"]
+        for flavor in flavors:
+            size = entry.get(flavor)
+            if size is None:
+                line += f" {'-':>18}"
+                continue
+            totals[flavor] += size
+            line += f" {size / 1024:>7.1f} KiB ({size / entry['source_bytes'] * 100:>3.0f}%)"
+        out.write(line + "\n")
+    if len(by_font) > 1:
+        line = f"{'total':<32} {totals['source_bytes'] / 1024:>7.1f} KiB"
+        for flavor in flavors:
+            line += f" {totals[flavor] / 1024:>7.1f} KiB ({totals[flavor] / totals['source_bytes'] * 100:>3.0f}%)"
+        out.write(line + "\n")